@@ -1,95 +1,3397 @@
 # By Dhanwanth
-import sympy as sp
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox, Frame, Canvas
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import numpy as np
-from PIL import Image, ImageTk
-import io
+import time
+_START_TIME = time.perf_counter()
+import os
+import sys
+import csv
+import json
+import math
+import queue
+import argparse
+import importlib
+import itertools
+import functools
+import threading
+import contextlib
+import gc
+import signal
+import select
+import logging
+import concurrent.futures
+import collections
+import multiprocessing
+import hashlib
+import pickle
+import sqlite3
+import tempfile
+
+_IMPORT_TIMES = {}  # module name -> seconds spent importing it, for --profile-startup
+
+class _LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    SymPy, NumPy and the GUI stack (Tk, Matplotlib, PIL) all load this way, so
+    the window can paint before the heavy imports and the solver core never
+    pulls in GUI modules. On first use the proxy replaces its own global name
+    with the real module, so later accesses cost nothing extra.
+    """
+    def __init__(self, name, alias):
+        self._name = name
+        self._alias = alias
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            start = time.perf_counter()
+            loaded = self._name in sys.modules
+            self._module = importlib.import_module(self._name)
+            if not loaded:
+                _IMPORT_TIMES[self._name] = time.perf_counter() - start
+            globals()[self._alias] = self._module
+        return getattr(self._module, attr)
+
+sp = _LazyModule("sympy", "sp")
+np = _LazyModule("numpy", "np")
+tk = _LazyModule("tkinter", "tk")
+ttk = _LazyModule("tkinter.ttk", "ttk")
+mpl_figure = _LazyModule("matplotlib.figure", "mpl_figure")
+backend_tkagg = _LazyModule("matplotlib.backends.backend_tkagg", "backend_tkagg")
+backend_agg = _LazyModule("matplotlib.backends.backend_agg", "backend_agg")
+Image = _LazyModule("PIL.Image", "Image")
+ImageTk = _LazyModule("PIL.ImageTk", "ImageTk")
+asyncio = _LazyModule("asyncio", "asyncio")  # only the HTTP service needs it
+
+def warm_solver():
+    """Import the solver's heavy dependencies ahead of the first solve."""
+    sp.S  # first attribute access performs the import
+    np.ndarray
+
+# --- Tracing ---
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+_NULL_SPAN = contextlib.nullcontext()
+
+class Tracer:
+    """Per-stage timers and counters for the solve and render hot paths.
+
+    Off by default: span() then returns a shared no-op context manager and
+    count() returns at once, so instrumented code pays one attribute check.
+    When enabled, every span becomes a Chrome trace "complete" event and is
+    aggregated into per-stage count/total/max. Snapshots from worker
+    processes can be merged in, and export_chrome() writes a file that
+    chrome://tracing or Perfetto opens. Thread-safe.
+    """
+    def __init__(self, enabled=False, max_events=100000):
+        self.enabled = enabled
+        self.events = collections.deque(maxlen=max_events)
+        self.stages = {}   # name -> [count, total seconds, max seconds]
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """Context manager timing one stage; args are attached to the trace event."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        """Add n to a named counter (e.g. attempts, failures, cache hits)."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def record(self, name, start, end, args=None):
+        """Record a finished stage; start and end are time.perf_counter() values."""
+        event = {"name": name, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = {k: str(v) for k, v in args.items()}
+        with self._lock:
+            self.events.append(event)
+            self._add_stage(name, 1, end - start, end - start)
+
+    def _add_stage(self, name, count, total, longest):
+        stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+        stage[0] += count
+        stage[1] += total
+        stage[2] = max(stage[2], longest)
+
+    def snapshot(self):
+        """Picklable copy of the collected data."""
+        with self._lock:
+            return {"events": list(self.events),
+                    "stages": {k: list(v) for k, v in self.stages.items()},
+                    "counters": dict(self.counters)}
+
+    def merge(self, snapshot):
+        """Fold in a snapshot taken in another process."""
+        with self._lock:
+            self.events.extend(snapshot["events"])
+            for name, (count, total, longest) in snapshot["stages"].items():
+                self._add_stage(name, count, total, longest)
+            self.counters.update(snapshot["counters"])
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.stages.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """Stages sorted by total time as (name, count, total ms, max ms), plus the counters."""
+        with self._lock:
+            stages = sorted(((name, c, total * 1000, longest * 1000)
+                             for name, (c, total, longest) in self.stages.items()),
+                            key=lambda row: -row[2])
+            return stages, dict(self.counters)
+
+    def export_chrome(self, path):
+        """Write the events (and final counter values) in Chrome trace JSON format."""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        if counters:
+            end = max((e["ts"] + e["dur"] for e in events), default=time.perf_counter() * 1e6)
+            events.append({"name": "counters", "ph": "C", "ts": end, "pid": os.getpid(), "args": counters})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+tracer = Tracer(enabled=os.environ.get("BOTX_TRACE") == "1")
+
+def traced_call(profile_path, func, *args):
+    """Run func(*args) with tracing on, e.g. as a worker-process job.
+
+    Returns (result, trace snapshot, profile report). The snapshot is meant to
+    be merged into the caller's tracer. With a profile_path, the call also
+    runs under cProfile: stats are dumped to that file and the report holds
+    the top entries as text (otherwise it is None).
+    """
+    was_enabled = tracer.enabled
+    tracer.reset()
+    tracer.enabled = True
+    report = None
+    try:
+        if profile_path:
+            import cProfile, pstats, io
+            profiler = cProfile.Profile()
+            result = profiler.runcall(func, *args)
+            profiler.dump_stats(profile_path)
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(20)
+            report = text.getvalue()
+        else:
+            result = func(*args)
+    finally:
+        tracer.enabled = was_enabled
+    return result, tracer.snapshot(), report
 
 # --- Solver functions ---
-def solveX(eq, symbols, domain="real"):
-    if not isinstance(symbols, (list, tuple)):
-        symbols = [symbols]
+def _solve_domain(domain):
+    """Map a domain name to (SymPy set, whether to keep only imaginary roots)."""
     if domain.lower() == "real":
-        dom = sp.S.Reals
-        filter_imag = False
+        return sp.S.Reals, False
     elif domain.lower() == "complex":
-        dom = sp.S.Complexes
-        filter_imag = False
+        return sp.S.Complexes, False
     elif domain.lower() == "imaginary":
-        dom = sp.S.Complexes
-        filter_imag = True
+        return sp.S.Complexes, True
+    raise ValueError("Domain must be 'real', 'complex', or 'imaginary'")
+
+def _solve_for(eq, sym, domain="real", interval=None):
+    """Solve eq for one symbol. Returns (solutions, method used).
+
+    interval bounds the numerical fallback's root search (default ROOT_INTERVAL
+    over the reals, the box ROOT_BOX over the complex numbers). When the
+    symbolic stage exceeds the domain's SymbolicBudget the numerical roots are
+    returned instead, with a method starting "approximate".
+    """
+    dom, filter_imag = _solve_domain(domain)
+    try:
+        sol, method = dispatch_strategies(eq, sym, dom, symbolic_budget(domain))
+    except SymbolicBudgetExceeded as e:
+        _budget_exceeded(e, eq, domain)
+        sol, method = sp.ConditionSet(sym, eq, dom), e.label
+    box = interval
+    interval = interval or ROOT_INTERVAL
+
+    # If we get nothing useful, search for real roots numerically
+    if isinstance(sol, sp.ConditionSet) or sol == sp.EmptySet:
+        try:
+            with tracer.span("numeric-fallback"):
+                if dom == sp.S.Reals:
+                    numeric, numeric_method = certified_real_roots(eq.lhs - eq.rhs, sym, interval)
+                else:
+                    numeric, numeric_method = complex_root_set(eq.lhs - eq.rhs, sym, box, imaginary=filter_imag)
+            if numeric != sp.EmptySet:
+                sol = numeric
+                if not is_approximate(method):
+                    method = "numeric-fallback" if numeric_method == "multistart" else numeric_method
+                filter_imag = False  # complex_root_set has already kept only the imaginary roots
+        except Exception:
+            pass
+
+    if filter_imag and isinstance(sol, (sp.FiniteSet, set)):
+        sol = sp.FiniteSet(*[s for s in sol if s.is_imaginary])
+    elif filter_imag:
+        # Infinite or implicit sets: keep only the part on the imaginary axis
+        t = sp.Dummy('t', real=True)
+        sol = sp.Intersection(sol, sp.ImageSet(sp.Lambda(t, sp.I * t), sp.S.Reals))
+    return sol, method
+
+def solveX(eq, symbols, domain="real"):
+    if not isinstance(symbols, (list, tuple)):
+        symbols = [symbols]
+    _solve_domain(domain)  # validate before doing any work
+    
+    solutions = [_solve_for(eq, sym, domain)[0] for sym in symbols]
+    if len(solutions) == 1:
+        return solutions[0]
+    return solutions
+
+def normalize_input(text):
+    """Rewrite user shorthand (^ for powers, ln for log) into SymPy syntax."""
+    return text.strip().replace('^', '**').replace('ln', 'log')
+
+def parse_equation(eq_str):
+    """Parse 'lhs = rhs' (or an expression assumed equal to 0) into an sp.Eq."""
+    if '=' in eq_str:
+        lhs_str, rhs_str = eq_str.split('=', 1)
+        lhs = sp.sympify(lhs_str.strip())
+        rhs = sp.sympify(rhs_str.strip())
+        return sp.Eq(lhs, rhs)
+    expr = sp.sympify(eq_str, evaluate=False)
+    return sp.Eq(expr, 0)
+
+def syntax_error_message(error):
+    """Short, user-facing description of why an equation failed to parse."""
+    base = getattr(error, "base_exc", None) or error
+    name = type(base).__name__
+    if name == "TokenError":
+        return "Unbalanced parentheses"
+    if name == "SyntaxError":
+        return "Invalid syntax (check for missing operators, e.g. 2*x instead of 2x)"
+    message = str(base).splitlines()[0] if str(base) else name
+    return f"{name}: {message[:100]}"
+
+def parse_system(text):
+    """Parse 'eq1; eq2; ...' into a list of sp.Eq (one item for a single equation)."""
+    return [parse_equation(part) for part in text.split(';') if part.strip()]
+
+def equation_symbols(equation):
+    """Unknowns to solve for, as a tuple.
+
+    A single equation is solved for x when it contains x (other symbols are
+    parameters), otherwise for its alphabetically first symbol. A system
+    (tuple of equations) is solved for all of its free symbols.
+    """
+    x = sp.symbols('x')
+    if isinstance(equation, tuple):
+        free = set().union(*(eq.free_symbols for eq in equation))
+        return tuple(sorted(free, key=lambda s: s.name))
+    free = equation.free_symbols
+    if x in free or not free:
+        return (x,)
+    return (min(free, key=lambda s: s.name),)
+
+def solve_equation(eq, domain="real", numerical=False, interval=None, digits=None):
+    """Solve a parsed equation for its unknown. Returns (solutions, method used).
+
+    Numerically over the reals, every root in interval (default ROOT_INTERVAL)
+    is isolated with a certified enclosure, see certified_real_roots. Over the
+    complex numbers (or the imaginary axis) see complex_root_set; there
+    interval may also be a (re_lo, re_hi, im_lo, im_hi) box. digits asks for
+    numerical roots to that many significant digits; only the roots that
+    need it are recomputed at higher precision.
+    """
+    x = equation_symbols(eq)[0]
+    if numerical:
+        info = classify_equation(eq, x)
+        if info["kind"] == "identity":
+            return _solve_domain(domain)[0], "identity"
+        if domain.lower() == "real":
+            return certified_real_roots(info["expr"], x, interval or ROOT_INTERVAL, digits)
+        return complex_root_set(info["expr"], x, interval, digits, imaginary=domain.lower() == "imaginary")
+    return _solve_for(eq, x, domain, interval)
+
+def is_plottable(equation):
+    """True for a single equation in (at most) one unknown."""
+    return isinstance(equation, sp.Eq) and len(equation.free_symbols) <= 1
+
+def solve_details(eq_str, domain="real", numerical=False, cache=True, interval=None, digits=None):
+    """Solve an equation string and report how the answer was produced.
+
+    eq_str may hold a single equation or a ';'-separated system. Returns a
+    dict with the solutions, the parsed equation (a tuple of sp.Eq for a
+    system), the unknowns solved for, the method used and whether the result
+    came from the cache. System solutions are a FiniteSet of tuples ordered
+    like the unknowns. interval, a (lo, hi) pair, overrides ROOT_INTERVAL for
+    numerical root searches; such results are not cached. digits sets the
+    significant digits numerical roots are certified to (see solve_equation).
+    """
+    store = solution_cache() if cache and interval is None else None
+    if store is not None:
+        hit = store.lookup(eq_str, domain, numerical, digits)
+        if hit is not None:
+            tracer.count("cache.hit.text")
+            solutions, eq, method = hit
+            return {"solutions": solutions, "equation": eq, "symbols": equation_symbols(eq),
+                    "method": method, "cached": True}
+    
+    with tracer.span("parse"):
+        equations = parse_system(eq_str)
+    eq = equations[0] if len(equations) == 1 else tuple(equations)
+    cached = False
+    record = store.get(eq, domain, numerical, digits) if store is not None else None
+    if record is not None:
+        tracer.count("cache.hit.canonical")
+        solutions, method = record
+        cached = True
+    else:
+        tracer.count("cache.miss")
+        with tracer.span("solve", equation=eq_str, domain=domain, numerical=numerical):
+            if isinstance(eq, tuple):
+                solutions, method = solve_system(eq, domain, numerical)
+            else:
+                solutions, method = solve_equation(eq, domain, numerical, interval, digits)
+        if store is not None and not is_approximate(method):
+            # A budget-limited answer may be solved exactly next time, so keep it off disk
+            store.put(eq, domain, numerical, (solutions, method), digits)
+    if store is not None:
+        store.remember(eq_str, domain, numerical, (solutions, eq, method), digits)
+    return {"solutions": solutions, "equation": eq, "symbols": equation_symbols(eq),
+            "method": method, "cached": cached}
+
+def get_solution(eq_str, domain="real", numerical=False, cache=True, interval=None, digits=None):
+    details = solve_details(eq_str, domain, numerical, cache, interval, digits)
+    return details["solutions"], details["equation"]
+
+# --- Solver strategies ---
+STRATEGY_TIME_LIMIT = 2.0  # seconds a fast-path strategy may run before the next one takes over
+
+class StrategyTimeout(Exception):
+    pass
+
+def _alarm_usable():
+    """True where _time_limit can interrupt a computation (a POSIX main thread)."""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Raise StrategyTimeout after seconds (enforced only on a POSIX main thread)."""
+    if not seconds or not _alarm_usable():
+        yield
+        return
+    def on_alarm(signum, frame):
+        raise StrategyTimeout()
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def classify_equation(eq, sym):
+    """Inspect eq and pick the strategies to try for sym, cheapest first.
+
+    Returns a dict with the expression (lhs - rhs), its kind ("identity",
+    "linear", "quadratic", "polynomial", "rational", "trig", "parametric" or
+    "general"), the polynomial degree when there is one, and the ordered list
+    of strategy names.
+    """
+    if eq in (sp.S.true, sp.S.false):
+        # Eq() already decided it, e.g. "x = x" or "1 = 2"
+        expr = sp.S.Zero if eq == sp.S.true else sp.S.One
     else:
-        raise ValueError("Domain must be 'real', 'complex', or 'imaginary'")
+        expr = eq.lhs - eq.rhs
+    info = {"equation": eq, "expr": expr, "kind": "general", "degree": None}
+    if expr.free_symbols - {sym}:
+        info["kind"] = "parametric"
+    elif expr == 0:
+        info["kind"] = "identity"
+    elif expr.is_number:
+        info["kind"] = "polynomial"
+    elif expr.is_polynomial(sym):
+        degree = sp.degree(expr, sym)
+        info["degree"] = degree
+        info["kind"] = {1: "linear", 2: "quadratic"}.get(degree, "polynomial")
+    elif expr.is_rational_function(sym):
+        info["kind"] = "rational"
+    elif expr.atoms(sp.sin, sp.cos, sp.tan) and not (
+            expr.atoms(sp.Function) - expr.atoms(sp.sin, sp.cos, sp.tan)):
+        info["kind"] = "trig"
+    fast = {"identity": ["identity"], "linear": ["polynomial"], "quadratic": ["quadratic", "polynomial"],
+            "polynomial": ["polynomial"], "rational": ["rational"], "trig": ["trig"]}
+    info["strategies"] = fast.get(info["kind"], []) + ["solveset"]
+    return info
+
+def _in_domain(roots, dom):
+    """FiniteSet of roots within dom, or None if realness cannot be decided."""
+    if dom == sp.S.Reals:
+        if any(r.is_real is None for r in roots):
+            return None
+        roots = [r for r in roots if r.is_real]
+    return sp.FiniteSet(*roots)
+
+def _strategy_identity(info, sym, dom):
+    return dom
+
+def _strategy_quadratic(info, sym, dom):
+    a, b, c = sp.Poly(info["expr"], sym).all_coeffs()
+    disc = b**2 - 4*a*c
+    if dom == sp.S.Reals and disc.is_negative:
+        return sp.EmptySet
+    root = sp.sqrt(disc)
+    return _in_domain([(-b - root) / (2*a), (-b + root) / (2*a)], dom)
+
+def _strategy_polynomial(info, sym, dom):
+    poly = sp.Poly(info["expr"], sym)
+    if poly.degree() <= 0:
+        return sp.EmptySet  # nonzero constant
+    found = sp.roots(poly)
+    if sum(found.values()) != poly.degree():
+        return None  # no closed form for every root
+    return _in_domain(list(found), dom)
+
+def _strategy_rational(info, sym, dom):
+    numer, denom = sp.fraction(sp.together(info["expr"]))
+    if not (numer.is_polynomial(sym) and denom.is_polynomial(sym)):
+        return None
+    candidates = _strategy_polynomial({"expr": numer}, sym, dom)
+    if candidates is None:
+        return None
+    return sp.FiniteSet(*[r for r in candidates if sp.simplify(denom.subs(sym, r)) != 0])
+
+_TRIG_SOLUTIONS = {
+    # general solutions of f(u) = c in terms of the principal value v and n ∈ Z
+    # keyed on the function name so building the table does not import SymPy
+    "sin": lambda v, n: [v + 2*sp.pi*n, sp.pi - v + 2*sp.pi*n],
+    "cos": lambda v, n: [v + 2*sp.pi*n, -v + 2*sp.pi*n],
+    "tan": lambda v, n: [v + sp.pi*n],
+}
+
+def _strategy_trig(info, sym, dom):
+    """Equations in one trig function of a linear argument, e.g. 2*sin(3x+1)^2 = 1."""
+    if dom != sp.S.Reals:
+        return None
+    atoms = info["expr"].atoms(sp.sin, sp.cos, sp.tan)
+    if len(atoms) != 1:
+        return None
+    atom = atoms.pop()
+    arg = atom.args[0]
+    if not arg.is_polynomial(sym) or sp.degree(arg, sym) != 1:
+        return None
+    t = sp.Dummy('t')
+    g = info["expr"].subs(atom, t)
+    if g.has(sym) or not g.is_polynomial(t):
+        return None
+    values = sp.roots(sp.Poly(g, t))
+    if sum(values.values()) != sp.degree(g, t):
+        return None
     
-    solutions = []
-    for sym in symbols:
+    a, b = sp.Poly(arg, sym).all_coeffs()
+    n = sp.Dummy('n', integer=True)
+    inverse = {sp.sin: sp.asin, sp.cos: sp.acos, sp.tan: sp.atan}[atom.func]
+    sets = []
+    for c in values:
+        if c.is_real is None:
+            return None
+        if not c.is_real or (atom.func != sp.tan and abs(c) > 1):
+            continue
+        for u in _TRIG_SOLUTIONS[atom.func.__name__](inverse(c), n):
+            sets.append(sp.ImageSet(sp.Lambda(n, sp.expand((u - b) / a)), sp.S.Integers))
+    return sp.Union(*sets) if sets else sp.EmptySet
+
+def _strategy_solveset(info, sym, dom):
+    return sp.solveset(info["equation"], sym, domain=dom)
+
+SOLVER_STRATEGIES = {
+    "identity": _strategy_identity,
+    "quadratic": _strategy_quadratic,
+    "polynomial": _strategy_polynomial,
+    "rational": _strategy_rational,
+    "trig": _strategy_trig,
+    "solveset": _strategy_solveset,
+}
+
+def dispatch_strategies(eq, sym, dom, budget=None):
+    """Try the strategies chosen by classify_equation in order.
+
+    A strategy that declines (returns None), raises, or exceeds
+    STRATEGY_TIME_LIMIT hands over to the next. Returns (solutions, name of
+    the strategy that produced them); if all fail, the result is the
+    unevaluated ConditionSet attributed to "solveset". With a SymbolicBudget
+    the final solveset stage runs under it (see run_with_budget), and
+    SymbolicBudgetExceeded is raised when it is used up.
+    """
+    with tracer.span("classify"):
+        info = classify_equation(eq, sym)
+    for name in info["strategies"]:
+        limit = None if name == "solveset" else STRATEGY_TIME_LIMIT
         try:
-            sol = sp.solveset(eq, sym, domain=dom)
+            with tracer.span("strategy." + name):
+                if name == "solveset" and budget is not None:
+                    sol = run_with_budget(SOLVER_STRATEGIES[name], (info, sym, dom), budget,
+                                          is_heavy(info["expr"]))
+                else:
+                    with _time_limit(limit):
+                        sol = SOLVER_STRATEGIES[name](info, sym, dom)
+        except SymbolicBudgetExceeded:
+            raise
         except Exception:
-            sol = sp.ConditionSet(sym, eq, dom)
+            sol = None
+        if sol is not None:
+            return sol, name
+        tracer.count("strategy.declined")
+    return sp.ConditionSet(sym, eq, dom), "solveset"
+
+# --- Symbolic budget ---
+BUDGET_POLL = 0.02          # seconds between checks on a budgeted child process
+BUDGET_INLINE_SECONDS = 2.0 # in-process attempt before a symbolic solve moves to a child process
+SYMBOLIC_HEAVY_OPS = 100    # operation count from which a symbolic solve starts in a child process
+
+log = logging.getLogger("botx")
+
+SymbolicBudget = collections.namedtuple("SymbolicBudget", "seconds memory_mb")
+SymbolicBudget.__doc__ = """Limits for one unbounded symbolic solve.
+
+seconds: wall-clock time allowed. memory_mb: how far the solving process may
+grow past the resident size it started from. 0 disables either limit.
+"""
+
+# Kept well under SOLVE_TIMEOUT so the numerical fallback still has time to run
+SYMBOLIC_BUDGETS = {
+    "real": SymbolicBudget(10.0, 1024),
+    "complex": SymbolicBudget(15.0, 1024),
+    "imaginary": SymbolicBudget(15.0, 1024),
+}
+
+class SymbolicBudgetExceeded(Exception):
+    """The symbolic stage ran out of time ("time") or memory ("memory")."""
+    def __init__(self, reason, budget):
+        self.reason = reason
+        self.budget = budget
+        super().__init__(f"symbolic solve exceeded its {reason} budget")
+
+    @property
+    def label(self):
+        """Method name reported for the numerical answer given instead."""
+        return "approximate (symbolic timed out)" if self.reason == "time" else "approximate (symbolic out of memory)"
+
+def is_approximate(method):
+    """True for a method label produced by falling back after a budget ran out."""
+    return bool(method) and method.startswith("approximate")
+
+def parse_budgets(text, budgets=None):
+    """Apply "domain=seconds[:memory_mb],..." to a copy of budgets (default SYMBOLIC_BUDGETS).
+
+    Raises ValueError for an unknown domain or a malformed or negative value.
+    """
+    budgets = dict(SYMBOLIC_BUDGETS if budgets is None else budgets)
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        domain, _, value = item.partition("=")
+        domain = domain.strip().lower()
+        if domain not in budgets:
+            raise ValueError(f"unknown domain in symbolic budget: {domain!r}")
+        seconds, _, memory = value.partition(":")
+        budget = SymbolicBudget(float(seconds), int(memory) if memory else budgets[domain].memory_mb)
+        if budget.seconds < 0 or budget.memory_mb < 0:
+            raise ValueError(f"symbolic budget for {domain} must not be negative")
+        budgets[domain] = budget
+    return budgets
+
+def set_symbolic_budgets(text):
+    """Apply parse_budgets(text) here and, through the environment, in worker processes."""
+    SYMBOLIC_BUDGETS.update(parse_budgets(text))
+    os.environ["BOTX_SYMBOLIC_BUDGET"] = ",".join(
+        f"{domain}={b.seconds:g}:{b.memory_mb}" for domain, b in SYMBOLIC_BUDGETS.items())
+
+if os.environ.get("BOTX_SYMBOLIC_BUDGET"):
+    try:
+        SYMBOLIC_BUDGETS.update(parse_budgets(os.environ["BOTX_SYMBOLIC_BUDGET"]))
+    except ValueError as e:
+        log.warning("ignoring BOTX_SYMBOLIC_BUDGET: %s", e)
+
+def symbolic_budget(domain):
+    """The SymbolicBudget for a domain name, or None when both limits are off."""
+    budget = SYMBOLIC_BUDGETS[domain.lower()]
+    return budget if budget.seconds or budget.memory_mb else None
+
+def _budget_exceeded(error, equation, domain):
+    """Log and count a symbolic solve that ran out of budget."""
+    tracer.count("budget.exceeded." + error.reason)
+    log.warning("symbolic solve of %s over %s exceeded its %s budget (%gs, %d MB); "
+                "answering numerically", equation, domain, error.reason,
+                error.budget.seconds, error.budget.memory_mb)
+
+def is_heavy(expr):
+    """True for an expression (or list of them) big enough to go straight to a child process."""
+    return sp.count_ops(expr) > SYMBOLIC_HEAVY_OPS
+
+def _rss_bytes(pid):
+    """Resident set size of a process from /proc, or None where that is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+@contextlib.contextmanager
+def _memory_limit(megabytes, exceeded):
+    """Fire _time_limit's alarm as soon as this process grows megabytes past its current size.
+
+    A watchdog thread polls the resident size every BUDGET_POLL seconds and
+    sets the threading.Event exceeded before firing, so the caller can tell
+    the StrategyTimeout apart from running out of time. Needs /proc (Linux)
+    and an enclosing _time_limit.
+    """
+    base = _rss_bytes(os.getpid())
+    if not megabytes or base is None:
+        yield
+        return
+    limit = base + megabytes * 2**20
+    done = threading.Event()
+    def watch():
+        while not done.wait(BUDGET_POLL):
+            if (_rss_bytes(os.getpid()) or 0) > limit:
+                exceeded.set()
+                signal.setitimer(signal.ITIMER_REAL, 1e-6)
+                return
+    watchdog = threading.Thread(target=watch, name="botx-memory-limit", daemon=True)
+    watchdog.start()
+    try:
+        yield
+    finally:
+        done.set()
+        watchdog.join()
+
+def _run_inline(func, args, budget, seconds):
+    """func(*args) in this process under seconds of alarm and the memory budget.
+
+    Raises SymbolicBudgetExceeded("memory") when the memory limit is hit and
+    StrategyTimeout when the time runs out.
+    """
+    exceeded = threading.Event()
+    try:
+        with _time_limit(seconds), _memory_limit(budget.memory_mb, exceeded):
+            return func(*args)
+    except StrategyTimeout:
+        if exceeded.is_set():
+            raise SymbolicBudgetExceeded("memory", budget) from None
+        raise
+
+def run_with_budget(func, args, budget, heavy=False):
+    """Return func(*args), held to budget.
+
+    Most symbolic solves finish quickly, so func first runs in this process
+    for up to BUDGET_INLINE_SECONDS, under the fast strategies' alarm and a
+    watchdog on the memory limit (see _run_inline), at no extra cost. If the
+    time runs out, it runs again in a forked child with the rest of the
+    budget (see _run_forked). It starts in the child straight away when
+    heavy is true or the alarm cannot be used here. Raises
+    SymbolicBudgetExceeded when the budget is used up; exceptions raised by
+    func are re-raised. Without os.fork the whole budget runs in this
+    process.
+    """
+    if budget is None:
+        return func(*args)
+    if not hasattr(os, "fork"):
+        try:
+            return _run_inline(func, args, budget, budget.seconds)
+        except StrategyTimeout:
+            raise SymbolicBudgetExceeded("time", budget) from None
+
+    start = time.monotonic()
+    if not heavy and _alarm_usable():
+        try:
+            return _run_inline(func, args, budget, min(BUDGET_INLINE_SECONDS, budget.seconds or BUDGET_INLINE_SECONDS))
+        except StrategyTimeout:
+            tracer.count("budget.escalated")
+    seconds = budget.seconds
+    if seconds:
+        seconds -= time.monotonic() - start
+        if seconds <= 0:
+            raise SymbolicBudgetExceeded("time", budget)
+    return _run_forked(func, args, budget, seconds)
+
+def _run_forked(func, args, budget, seconds):
+    """Return func(*args) computed in a forked child, killed after seconds or past budget.memory_mb.
+
+    The memory limit is growth beyond the child's starting size and needs
+    /proc (Linux). SymbolicBudgetExceeded carries budget.
+    """
+    base = _rss_bytes(os.getpid())
+    read_fd, write_fd = os.pipe()
+    # Keep the child's garbage collector off the inherited heap, which would copy every page it touches
+    gc.freeze()
+    try:
+        pid = os.fork()
+    except OSError:
+        gc.unfreeze()
+        os.close(read_fd)
+        os.close(write_fd)
+        raise
+    if pid != 0:
+        gc.unfreeze()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            if seconds:
+                # Do not outlive the budget even if the parent is killed first
+                signal.signal(signal.SIGALRM, signal.SIG_DFL)
+                signal.setitimer(signal.ITIMER_REAL, seconds + 1)
+            try:
+                result = ("ok", func(*args))
+            except Exception as e:
+                result = ("error", e)
+            try:
+                data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                data = pickle.dumps(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+            with os.fdopen(write_fd, "wb") as out:
+                out.write(data)
+            status = 0
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    deadline = time.monotonic() + seconds if seconds else None
+    limit = base + budget.memory_mb * 2**20 if budget.memory_mb and base is not None else None
+    chunks = []
+    reason = None
+    finished = False
+    try:
+        while True:
+            wait = BUDGET_POLL if deadline is None else min(BUDGET_POLL, deadline - time.monotonic())
+            if wait > 0 and select.select([read_fd], [], [], wait)[0]:
+                data = os.read(read_fd, 1 << 16)
+                if not data:
+                    break
+                chunks.append(data)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                reason = "time"
+                break
+            if limit is not None and (_rss_bytes(pid) or 0) > limit:
+                reason = "memory"
+                break
+        finished = reason is None
+    finally:
+        os.close(read_fd)
+        if not finished:
+            os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+    if reason is not None:
+        raise SymbolicBudgetExceeded(reason, budget)
+    if not chunks:
+        # Killed before it could answer: by its own alarm, or by the kernel when memory ran out
+        killer = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+        if killer == signal.SIGALRM:
+            raise SymbolicBudgetExceeded("time", budget)
+        if killer == signal.SIGKILL:
+            raise SymbolicBudgetExceeded("memory", budget)
+        raise RuntimeError("symbolic solve process exited without a result")
+    kind, value = pickle.loads(b"".join(chunks))
+    if kind == "error":
+        raise value
+    return value
+
+# --- Compiled evaluation ---
+EVAL_BACKEND = os.environ.get("BOTX_EVAL_BACKEND", "auto")  # auto or a name in EVAL_BACKENDS
+NUMEXPR_MIN_SIZE = 1 << 16  # below this many points numexpr's setup cost outweighs its fusion
+
+@functools.lru_cache(maxsize=None)
+def _numexpr():
+    """The numexpr module, or None when it is not installed (it is optional)."""
+    try:
+        import numexpr
+    except ImportError:
+        return None
+    return numexpr
+
+def _cse_program(exprs, syms):
+    """Common subexpressions of exprs as (steps, outputs, argument names).
+
+    The unknowns are renamed to plain identifiers and numeric constants such
+    as pi are turned into floats, so every step prints as a bare arithmetic
+    expression.
+    """
+    args = sp.symbols(f"_a0:{len(syms)}")
+    renamed = []
+    for e in exprs:
+        e = sp.sympify(e).xreplace(dict(zip(syms, args)))
+        renamed.append(e.xreplace({c: sp.Float(c) for c in e.atoms(sp.NumberSymbol)}))
+    steps, outputs = sp.cse(renamed, symbols=sp.numbered_symbols("_t"))
+    return steps, outputs, [str(a) for a in args]
+
+def _compile_numexpr(exprs, syms):
+    """One fused, multi-threaded numexpr kernel per CSE step: no NumPy temporaries."""
+    ne = _numexpr()
+    if ne is None:
+        raise ImportError("numexpr is not installed")
+    from sympy.printing.lambdarepr import NumExprPrinter
+    printer = NumExprPrinter()
+    steps, outputs, names = _cse_program(exprs, syms)
+    program = [(str(name), printer._print(value)) for name, value in steps]
+    results = [printer._print(out) for out in outputs]
+    def evaluate(*values):
+        env = dict(zip(names, values))
+        for name, code in program:
+            env[name] = ne.evaluate(code, local_dict=env)
+        return [ne.evaluate(code, local_dict=env) for code in results]
+    return evaluate
+
+@functools.lru_cache(maxsize=None)
+def _numpy_printer():
+    """NumPy code printer that writes small integer powers as products.
+
+    numpy.power has no fast path for x**3 and up, and repeated multiplication
+    is an order of magnitude quicker on large arrays.
+    """
+    from sympy.printing.numpy import NumPyPrinter
+    from sympy.printing.precedence import PRECEDENCE
+
+    class Printer(NumPyPrinter):
+        def _print_Pow(self, expr, rational=False):
+            n = expr.exp
+            if n.is_Integer and 3 <= abs(n) <= 8:
+                product = "*".join([self.parenthesize(expr.base, PRECEDENCE["Pow"])] * abs(int(n)))
+                return f"({product})" if n > 0 else f"(1/({product}))"
+            return super()._print_Pow(expr, rational)
+    return Printer()
+
+def _compile_numpy(exprs, syms):
+    """Straight-line NumPy code: one local per common subexpression, one ufunc per operation."""
+    printer = _numpy_printer()
+    steps, outputs, names = _cse_program(exprs, syms)
+    lines = [f"def compiled({', '.join(names)}):"]
+    lines += [f"    {name} = {printer._print(value)}" for name, value in steps]
+    lines.append(f"    return [{', '.join(printer._print(out) for out in outputs)}]")
+    namespace = {"numpy": np}
+    exec("\n".join(lines), namespace)
+    return namespace["compiled"]
+
+def _compile_lambdify(exprs, syms):
+    """Plain lambdify, for anything the CSE code generators cannot print."""
+    return sp.lambdify(syms, list(exprs), 'numpy')
+
+def _compile_mpmath(exprs, syms):
+    """Element-wise mpmath evaluation: slow, but handles any SymPy function."""
+    funcs = [sp.lambdify(syms, e, 'mpmath') for e in exprs]
+    def evaluate(*values):
+        values = np.broadcast_arrays(*[np.asarray(v) for v in values])
+        outs = [np.empty(values[0].shape) for _ in funcs]
+        for i, point in enumerate(zip(*[v.ravel() for v in values])):
+            point = [float(p) for p in point]
+            for f, out in zip(funcs, outs):
+                try:
+                    value = complex(f(*point))
+                    out.flat[i] = value.real if abs(value.imag) < 1e-12 else np.nan
+                except Exception:
+                    out.flat[i] = np.nan
+        return outs
+    return evaluate
+
+EVAL_BACKENDS = {
+    "numexpr": _compile_numexpr,
+    "numpy": _compile_numpy,
+    "lambdify": _compile_lambdify,
+    "mpmath": _compile_mpmath,
+}
+
+class CompiledExpression:
+    """One or more expressions compiled for fast evaluation on NumPy arrays.
+
+    Called with one array per symbol; returns an array (or a list of arrays
+    when compiled from a tuple of expressions). In "auto" mode the first of
+    numpy, lambdify and mpmath that works is used. The first time a large
+    array comes in and numexpr is installed, a numexpr kernel races it on
+    that array, and wins large arrays from then on if it is faster.
+    """
+    def __init__(self, expr, syms, backend=EVAL_BACKEND):
+        self.single = not isinstance(expr, tuple)
+        self.exprs = (expr,) if self.single else expr
+        self.syms = syms
+        self._large = None  # numexpr kernel for arrays of NUMEXPR_MIN_SIZE and up
+        order = [name for name in EVAL_BACKENDS if name != "numexpr"]
+        if backend != "auto":
+            order.insert(0, backend)
+        for name in dict.fromkeys(order):
+            self._small = self._compile(name)
+            if self._small is not None:
+                self.backend = name
+                break
+        else:
+            raise ValueError(f"cannot compile {self.exprs} for numerical evaluation")
+        self._race_pending = backend == "auto" and self.backend in ("numpy", "lambdify")
+
+    def _race(self, values):
+        """Adopt a numexpr kernel for large arrays if it beats the NumPy code on values."""
+        self._race_pending = False
+        if _numexpr() is None:
+            return
+        large = self._compile("numexpr")
+        if large is not None and self._timing(large, values) < self._timing(self._small, values):
+            self._large = large
+            self.backend = "numexpr+" + self.backend
+
+    def _compile(self, name):
+        """Compile with one backend and check it on a few points; None if it fails."""
+        probe = [np.linspace(0.1, 1.0, 3)] * len(self.syms)
+        try:
+            with tracer.span("compile", backend=name):
+                func = EVAL_BACKENDS[name](self.exprs, self.syms)
+                with np.errstate(all='ignore'):
+                    func(*probe)
+            return func
+        except Exception:
+            tracer.count(f"compile.{name}.failed")
+            return None
+
+    def _timing(self, func, values):
+        start = time.perf_counter()
+        with np.errstate(all='ignore'):
+            func(*values)
+        return time.perf_counter() - start
+
+    def __call__(self, *values):
+        func = self._small
+        if np.size(values[0]) >= NUMEXPR_MIN_SIZE:
+            if self._race_pending:
+                self._race(values)
+            func = self._large or func
+        with np.errstate(all='ignore'):
+            out = func(*values)
+        return out[0] if self.single else out
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expr, syms, backend=EVAL_BACKEND):
+    """Cached CompiledExpression for expr (or a tuple of expressions) in syms.
+
+    syms is a symbol or a tuple of symbols. Expressions are compiled once,
+    after SymPy common-subexpression elimination, by the first backend in
+    EVAL_BACKENDS that can evaluate them. BOTX_EVAL_BACKEND=<name> tries
+    that backend first.
+    """
+    syms = (syms,) if isinstance(syms, sp.Symbol) else tuple(syms)
+    tracer.count("compile.miss")
+    return CompiledExpression(expr, syms, backend)
+
+@functools.lru_cache(maxsize=256)
+def compile_derivative(expr, sym, backend=EVAL_BACKEND):
+    """Cached f'(x) for Newton steps, by central differences when expr has no usable derivative."""
+    try:
+        return compile_expression(sp.diff(expr, sym), sym, backend)
+    except Exception:
+        f = compile_expression(expr, sym, backend)
+        def df(xs, h=1e-7):
+            step = h * (1 + np.abs(xs))
+            return (_real_values(f, xs + step) - _real_values(f, xs - step)) / (2 * step)
+        return df
+
+def clear_compiled_cache():
+    """Forget every compiled callable, e.g. to time cold compiles."""
+    compile_expression.cache_clear()
+    compile_derivative.cache_clear()
+    interval_function.cache_clear()
+
+# --- Numerical root finding ---
+ROOT_INTERVAL = (-10.0, 10.0)  # default search interval for numerical roots
+ROOT_SAMPLES = 4001            # grid points scanned for sign changes
+
+def _real_values(f, xs):
+    """Evaluate f on the array xs, mapping non-real or failed results to nan."""
+    with np.errstate(all='ignore'):
+        ys = np.asarray(f(xs))
+    if ys.shape != xs.shape:
+        ys = np.broadcast_to(ys, xs.shape)
+    if np.iscomplexobj(ys):
+        ys = np.where(np.abs(ys.imag) <= 1e-12 * (1 + np.abs(ys.real)), ys.real, np.nan)
+    return np.asarray(ys, dtype=float)
+
+def _newton_bracketed(f, df, lo, hi, flo, tol, max_iter=100):
+    """Refine every bracket [lo, hi] at once with Newton steps guarded by bisection."""
+    x = 0.5 * (lo + hi)
+    for _ in range(max_iter):
+        fx = _real_values(f, x)
+        dfx = _real_values(df, x)
+        same = np.sign(fx) == np.sign(flo)
+        lo = np.where(same, x, lo)
+        flo = np.where(same, fx, flo)
+        hi = np.where(same, hi, x)
+        with np.errstate(all='ignore'):
+            step = x - fx / dfx
+        inside = np.isfinite(step) & (step > lo) & (step < hi)
+        x = np.where(inside, step, 0.5 * (lo + hi))
+        x = np.where(fx == 0, np.where(same, lo, hi), x)
+        if np.all((hi - lo <= tol * (1 + np.abs(x))) | (fx == 0)):
+            break
+    return x
+
+def _newton(f, df, x, tol, max_iter=60):
+    """Plain vectorized Newton iteration from the seeds x."""
+    for _ in range(max_iter):
+        fx = _real_values(f, x)
+        dfx = _real_values(df, x)
+        with np.errstate(all='ignore'):
+            step = fx / dfx
+        step = np.where(np.isfinite(step), step, 0.0)
+        x = x - step
+        if np.all(np.abs(step) <= tol * (1 + np.abs(x))):
+            break
+    return x
+
+def _dip_roots(f, df, xs, ys, scale, tol):
+    """Newton runs from the local minima of |f| on the grid xs that come close to zero.
+
+    ys holds f(xs). This catches even-multiplicity roots, which do not change
+    sign. Returns the end points that stay inside the grid; the caller still
+    has to check their residual.
+    """
+    mag = np.where(np.isfinite(ys), np.abs(ys), np.inf)
+    dip = (mag[1:-1] < mag[:-2]) & (mag[1:-1] <= mag[2:]) & (mag[1:-1] < 1e-2 * scale)
+    if not dip.any():
+        return np.empty(0)
+    seeds = _newton(f, df, xs[1:-1][dip], tol)
+    return seeds[(seeds >= xs[0]) & (seeds <= xs[-1])]
+
+def _pole_brackets(f, xs, ys, finite, depth=52):
+    """Brackets for roots squeezed between a grid point and a non-finite sample.
+
+    A pole that falls exactly on the grid hides any root between it and the
+    neighbouring grid point, as in 1/x - 300. For every finite sample next
+    to a non-finite one, f is sampled at points halving the distance towards
+    the non-finite one, and the first sign change becomes a bracket.
+    Returns (lo, hi, f(lo)) arrays for _newton_bracketed.
+    """
+    edge = finite[:-1] != finite[1:]
+    if not edge.any():
+        return None
+    i = np.nonzero(edge)[0]
+    far = np.where(finite[i], i, i + 1)
+    near = np.where(finite[i], i + 1, i)
+    t = 2.0 ** -np.arange(depth + 1)
+    pts = xs[near] + (xs[far] - xs[near]) * t[:, None]
+    vals = _real_values(f, pts)
+    vals[0] = ys[far]
+    ok = np.isfinite(vals)
+    change = ok[:-1] & ok[1:] & (np.sign(vals[:-1]) * np.sign(vals[1:]) < 0)
+    hit = change.any(axis=0)
+    if not hit.any():
+        return None
+    row = np.argmax(change, axis=0)[hit]
+    col = np.nonzero(hit)[0]
+    x0, x1 = pts[row, col], pts[row + 1, col]
+    f0, f1 = vals[row, col], vals[row + 1, col]
+    return np.minimum(x0, x1), np.maximum(x0, x1), np.where(x0 < x1, f0, f1)
+
+def _polish(expr, sym, roots, dps):
+    """Refine float roots with mpmath at dps significant digits."""
+    import mpmath
+    f_mp = sp.lambdify(sym, expr, 'mpmath')
+    polished = []
+    with mpmath.workdps(dps + 5):
+        for r in roots:
+            try:
+                polished.append(sp.Float(mpmath.findroot(f_mp, mpmath.mpf(r)), dps))
+            except Exception:
+                polished.append(sp.Float(r, dps))
+    return polished
+
+def find_real_roots(expr, sym, interval=ROOT_INTERVAL, samples=ROOT_SAMPLES, dps=None, tol=1e-13):
+    """Find all real roots of expr = 0 for sym in the closed interval.
+
+    The expression and its derivative are compiled once (and cached, see
+    compile_expression). f is scanned on a
+    dense grid; every sign change becomes a bracket, and all brackets are
+    refined together with safeguarded Newton steps. Near-zero local minima of
+    |f| seed plain Newton runs, which catches even-multiplicity roots that do
+    not change sign. Where the grid hits a pole or the edge of the domain,
+    the gap to the next grid point is searched by repeated halving. Sign
+    changes caused by poles are discarded. Roots are
+    deduplicated by sorting. If dps is given, each root is polished with
+    mpmath at that precision at the very end. Returns a sorted list of sp.Float.
+    """
+    f = compile_expression(expr, sym)
+    df = compile_derivative(expr, sym)
+    a, b = float(interval[0]), float(interval[1])
+    xs = np.linspace(a, b, samples)
+    ys = _real_values(f, xs)
+    finite = np.isfinite(ys)
+    if not finite.any():
+        return []
+    scale = np.median(np.abs(ys[finite])) + 1.0
+
+    found = [xs[ys == 0]]
+    y0, y1 = ys[:-1], ys[1:]
+    bracket = finite[:-1] & finite[1:] & (np.sign(y0) * np.sign(y1) < 0)
+    if bracket.any():
+        found.append(_newton_bracketed(f, df, xs[:-1][bracket], xs[1:][bracket], y0[bracket], tol))
+    near_pole = _pole_brackets(f, xs, ys, finite)
+    if near_pole is not None:
+        found.append(_newton_bracketed(f, df, *near_pole, tol))
+
+    # Local minima of |f| that stay close to zero: possible touching roots
+    found.append(_dip_roots(f, df, xs, ys, scale, tol))
+
+    roots = np.concatenate(found)
+    if roots.size == 0:
+        return []
+    residual = np.abs(_real_values(f, roots))
+    roots = np.sort(roots[np.isfinite(residual) & (residual <= 1e-7 * scale)])
+    if roots.size == 0:
+        return []
+    keep = np.concatenate([[True], np.diff(roots) > 1e-9 * (1 + np.abs(roots[1:]))])
+    roots = roots[keep]
+
+    if dps:
+        return _polish(expr, sym, roots, dps)
+    return [sp.Float(float(r)) for r in roots]
+
+# --- Certified root isolation ---
+RootIsolation = collections.namedtuple("RootIsolation", "roots unresolved singular method touching")
+RootIsolation.__doc__ = """Result of isolate_real_roots.
+
+roots: (lo, hi) enclosures, each holding exactly one root (polynomial
+roots are counted once whatever their multiplicity). unresolved: intervals
+that may hold roots the engine could not separate or certify. singular:
+narrow intervals around poles. touching: roots found by Newton's method in
+minimum-width unresolved intervals, such as the double roots of cos(x)**2;
+their residual is checked, but they are not certified. Every real root in
+the search interval lies in a roots or unresolved enclosure, or in the
+interval a touching root was found in.
+"""
+
+def _outward(lo, hi, ulps=1):
+    """Widen [lo, hi] by a few units in the last place to cover rounding error."""
+    for _ in range(ulps):
+        lo = np.nextafter(lo, -np.inf)
+        hi = np.nextafter(hi, np.inf)
+    return lo, hi
+
+def _i_mul(a, b):
+    products = [a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1]]  # 0*inf gives nan: ignored
+    return _outward(np.fmin.reduce(products), np.fmax.reduce(products))
+
+def _i_recip(a):
+    lo, hi = a
+    with np.errstate(divide='ignore'):
+        spans_zero = (lo < 0) & (hi > 0)
+        new_lo = np.where(spans_zero | (hi == 0), -np.inf, 1 / hi)
+        new_hi = np.where(spans_zero | (lo == 0), np.inf, 1 / lo)
+    return _outward(new_lo, new_hi)
+
+def _i_int_pow(a, n):
+    if n < 0:
+        return _i_recip(_i_int_pow(a, -n))
+    lo, hi = a
+    p_lo, p_hi = lo ** n, hi ** n
+    if n % 2:
+        return _outward(p_lo, p_hi)
+    low = np.where(lo >= 0, p_lo, np.where(hi <= 0, p_hi, 0.0))
+    return _outward(low, np.maximum(p_lo, p_hi))
+
+def _i_monotone(func, decreasing=False):
+    def apply(a):
+        lo, hi = func(a[0]), func(a[1])
+        return _outward(hi, lo, 2) if decreasing else _outward(lo, hi, 2)
+    return apply
+
+def _i_log(a):
+    lo, hi = a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_lo = np.log(np.maximum(lo, 0.0))
+        new_hi = np.where(hi > 0, np.log(hi), np.nan)  # nan: undefined on the whole box
+    return _outward(new_lo, new_hi, 2)
+
+def _i_real_pow(a, c):
+    """a**c for a non-integer constant c, defined for a >= 0."""
+    lo, hi = np.maximum(a[0], 0.0), np.where(a[1] >= 0, a[1], np.nan)
+    with np.errstate(divide='ignore'):
+        p_lo, p_hi = lo ** c, hi ** c
+    return _outward(p_lo, p_hi, 2) if c > 0 else _outward(p_hi, p_lo, 2)
+
+def _i_sin(a, shift=0.0):
+    """sin over boxes (cos via shift=pi/2): endpoints plus any peaks inside."""
+    lo, hi = a[0] + shift, a[1] + shift
+    s_lo, s_hi = np.sin(lo), np.sin(hi)
+    low, high = np.minimum(s_lo, s_hi), np.maximum(s_lo, s_hi)
+    two_pi = 2 * np.pi
+    has_max = np.ceil((lo - np.pi / 2) / two_pi) <= np.floor((hi - np.pi / 2) / two_pi)
+    has_min = np.ceil((lo + np.pi / 2) / two_pi) <= np.floor((hi + np.pi / 2) / two_pi)
+    wide = (hi - lo) >= two_pi
+    low, high = _outward(low, high, 2)
+    return (np.where(has_min | wide, -1.0, np.maximum(low, -1.0)),
+            np.where(has_max | wide, 1.0, np.minimum(high, 1.0)))
+
+def _i_tan(a):
+    lo, hi = a
+    has_pole = np.ceil((lo - np.pi / 2) / np.pi) <= np.floor((hi - np.pi / 2) / np.pi)
+    t_lo, t_hi = _outward(np.tan(lo), np.tan(hi), 2)
+    return np.where(has_pole, -np.inf, t_lo), np.where(has_pole, np.inf, t_hi)
+
+def _i_abs(a):
+    lo, hi = a
+    low = np.where(lo >= 0, lo, np.where(hi <= 0, -hi, 0.0))
+    return low, np.maximum(np.abs(lo), np.abs(hi))
+
+def _i_cosh(a):
+    lo, hi = _i_abs(a)
+    return _outward(np.cosh(lo), np.cosh(hi), 2)
+
+_INTERVAL_FUNCS = {
+    "exp": lambda a: _i_monotone(np.exp)(a),
+    "log": _i_log,
+    "sin": _i_sin,
+    "cos": lambda a: _i_sin(a, np.pi / 2),
+    "tan": _i_tan,
+    "Abs": _i_abs,
+    "atan": lambda a: _i_monotone(np.arctan)(a),
+    "sinh": lambda a: _i_monotone(np.sinh)(a),
+    "cosh": _i_cosh,
+    "tanh": lambda a: _i_monotone(np.tanh)(a),
+    "sign": lambda a: (np.where(a[0] > 0, 1.0, np.where(a[0] < 0, -1.0, 0.0)),
+                       np.where(a[1] < 0, -1.0, np.where(a[1] > 0, 1.0, 0.0))),
+}
+
+@functools.lru_cache(maxsize=256)
+def interval_function(expr, sym):
+    """Compile expr into F(lo, hi) -> (lo, hi) over NumPy arrays of boxes.
+
+    The result encloses the range of expr over every box [lo[i], hi[i]]
+    (up to outward-rounded floating point). A nan bound means expr is
+    undefined on the whole box. Raises NotImplementedError for functions
+    without an interval extension.
+    """
+    def compile_(e):
+        if e == sym:
+            return lambda box: box
+        if e.is_Number or e.is_NumberSymbol or (e.is_number and e.is_real):
+            value = float(e)
+            return lambda box: _outward(np.full_like(box[0], value), np.full_like(box[0], value))
+        if e.is_Add:
+            parts = [compile_(arg) for arg in e.args]
+            def add(box):
+                lo, hi = parts[0](box)
+                for part in parts[1:]:
+                    p_lo, p_hi = part(box)
+                    lo, hi = _outward(lo + p_lo, hi + p_hi)
+                return lo, hi
+            return add
+        if e.is_Mul:
+            parts = [compile_(arg) for arg in e.args]
+            def mul(box):
+                result = parts[0](box)
+                for part in parts[1:]:
+                    result = _i_mul(result, part(box))
+                return result
+            return mul
+        if e.is_Pow:
+            base, exponent = e.args
+            if exponent.is_Integer:
+                inner, n = compile_(base), int(exponent)
+                return lambda box: _i_int_pow(inner(box), n)
+            if exponent.is_number and exponent.is_real:
+                inner, c = compile_(base), float(exponent)
+                return lambda box: _i_real_pow(inner(box), c)
+            # b**g = exp(g*log(b))
+            return compile_(sp.exp(exponent * sp.log(base), evaluate=False))
+        name = type(e).__name__
+        if name in _INTERVAL_FUNCS and len(e.args) == 1:
+            inner, func = compile_(e.args[0]), _INTERVAL_FUNCS[name]
+            return lambda box: func(inner(box))
+        raise NotImplementedError(f"no interval extension for {name}")
+    compiled = compile_(sp.sympify(expr))
+    def F(lo, hi):
+        with np.errstate(all='ignore'):
+            out_lo, out_hi = compiled((np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)))
+        return np.broadcast_to(out_lo, np.shape(lo)), np.broadcast_to(out_hi, np.shape(lo))
+    return F
+
+def _merge_intervals(boxes, gap=0.0):
+    """Merge (lo, hi) pairs that overlap or are closer than gap."""
+    merged = []
+    for lo, hi in sorted(boxes):
+        if merged and lo <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [tuple(box) for box in merged]
+
+def _isolate_polynomial(poly, a, b, tol):
+    """Exact isolating intervals for a polynomial with rational coefficients."""
+    eps = sp.Rational(tol).limit_denominator(10**15) if tol else None
+    boxes = poly.intervals(inf=sp.Rational(a), sup=sp.Rational(b), eps=eps)
+    return [(float(lo), float(hi)) for (lo, hi), _ in boxes]
+
+def isolate_real_roots(expr, sym, interval=ROOT_INTERVAL, tol=1e-12, min_width=None, max_boxes=200000):
+    """Enclose every real root of expr = 0 for sym in the closed interval.
+
+    Polynomials with rational coefficients are isolated exactly by SymPy
+    (Descartes' rule of signs with continued fractions, see Poly.intervals).
+    Other expressions use interval branch-and-prune: all live boxes are
+    evaluated at once with interval_function. A box whose range excludes 0
+    is discarded. A box where the derivative's range excludes 0 gets an
+    interval Newton step: when the step maps the box into itself, the box
+    holds exactly one root and is contracted to width tol. Other boxes are
+    bisected until they are narrower than min_width (default: 1e-8 of the
+    interval). Those are reported as unresolved, or as singular when the
+    function blows up at their ends (a pole). Where |f| dips to zero inside
+    such a minimum-width interval without changing sign, Newton's method
+    looks for a touching root there (see _dip_roots).
+    """
+    a, b = float(interval[0]), float(interval[1])
+    expr = sp.sympify(expr)
+    if expr.is_polynomial(sym):
+        try:
+            poly = sp.Poly(expr, sym, domain='QQ')
+        except Exception:
+            poly = None
+        if poly is not None and not poly.is_zero:
+            return RootIsolation(_isolate_polynomial(poly, a, b, tol), [], [], "descartes", [])
+
+    real = sp.Symbol(sym.name, real=True)  # so that e.g. d|x|/dx is sign(x)
+    real_expr = expr.subs(sym, real)
+    F = interval_function(real_expr, real)
+    try:
+        dF = interval_function(sp.diff(real_expr, real), real)
+    except NotImplementedError:
+        dF = None  # bisection only
+    f = compile_expression(expr, sym)
+    min_width = (b - a) * 1e-8 if min_width is None else min_width
+    split = 0.5 - 2 ** -7  # off-centre, so roots rarely land on box edges
+    lo, hi = np.array([a]), np.array([b])
+    certified = np.array([False])
+    roots, unresolved = [], []
+
+    while lo.size:
+        if lo.size > max_boxes:
+            unresolved.extend(zip(lo, hi))  # out of budget: report, never drop
+            break
+        f_lo, f_hi = F(lo, hi)
+        keep = (f_lo <= 0) & (f_hi >= 0)
+        lo, hi, certified, f_lo, f_hi = lo[keep], hi[keep], certified[keep], f_lo[keep], f_hi[keep]
+        if not lo.size:
+            break
+
+        # Interval Newton step where f is monotone: N = m - f(m) / F'(X), intersected with X
+        # (bounded f and f' rule out poles, where the theory does not apply)
+        d_lo, d_hi = dF(lo, hi) if dF is not None else (np.full_like(lo, np.nan),) * 2
+        bounded = np.isfinite(f_lo) & np.isfinite(f_hi) & np.isfinite(d_lo) & np.isfinite(d_hi)
+        monotone = bounded & ((d_lo > 0) | (d_hi < 0))
+        m = lo + (hi - lo) * 0.5
+        fm_lo, fm_hi = F(m, m)
+        newton = monotone & np.isfinite(fm_lo) & np.isfinite(fm_hi)
+        r_lo, r_hi = _i_recip((np.where(newton, d_lo, 1.0), np.where(newton, d_hi, 1.0)))
+        q_lo, q_hi = _i_mul((fm_lo, fm_hi), (r_lo, r_hi))
+        n_lo, n_hi = _outward(m - q_hi, m - q_lo)
+        certified = certified | (newton & (n_lo > lo) & (n_hi < hi))  # N inside X: one root
+        new_lo = np.where(newton, np.maximum(lo, n_lo), lo)
+        new_hi = np.where(newton, np.minimum(hi, n_hi), hi)
+        empty = newton & ~(new_lo <= new_hi)  # N misses X: no root
+
+        width = new_hi - new_lo
+        shrunk = newton & ~empty & (width < 0.5 * (hi - lo))
+        tight = width <= np.maximum(tol, 8 * np.finfo(float).eps) * (1 + np.abs(new_lo))
+        done = certified & ~empty & (tight | (~shrunk & (width <= min_width)))
+        roots.extend(zip(new_lo[done], new_hi[done]))
+
+        alive = ~empty & ~done
+        iterate = alive & shrunk  # Newton is converging: keep going without splitting
+        bisect = alive & ~iterate & (width > min_width)
+        tiny = alive & ~iterate & ~bisect
+        if tiny.any():
+            # Monotone and continuous on a tiny box: a definite sign change proves
+            # the root; the same definite sign on both ends rules it out
+            t_lo, t_hi = new_lo[tiny], new_hi[tiny]
+            a_lo, a_hi = F(t_lo, t_lo)
+            b_lo, b_hi = F(t_hi, t_hi)
+            sign_change = ((a_hi < 0) & (b_lo > 0)) | ((a_lo > 0) & (b_hi < 0))
+            no_root = ((a_lo > 0) & (b_lo > 0)) | ((a_hi < 0) & (b_hi < 0))
+            mono = monotone[tiny]
+            proven = mono & sign_change
+            roots.extend(zip(t_lo[proven], t_hi[proven]))
+            open_ = ~proven & ~(mono & no_root)
+            unresolved.extend(zip(t_lo[open_], t_hi[open_]))
+
+        mid = new_lo[bisect] + (new_hi[bisect] - new_lo[bisect]) * split
+        lo = np.concatenate([new_lo[iterate], new_lo[bisect], mid])
+        hi = np.concatenate([new_hi[iterate], mid, new_hi[bisect]])
+        certified = np.concatenate([certified[iterate], np.zeros(2 * int(bisect.sum()), dtype=bool)])
+
+    roots = _merge_intervals(roots)
+    singular = []
+    resolved = []
+    for u, v in _merge_intervals(unresolved, max(min_width, (b - a) * 1e-5)):
+        ends = np.abs(_real_values(f, np.array([u, v])))
+        if np.nanmin(ends, initial=np.inf) > 1 / np.sqrt(max(v - u, 1e-300)):
+            singular.append((u, v))
+        else:
+            resolved.append((u, v))
+    resolved, touching = _touching_roots(f, real_expr, real, resolved, a, b, min_width, tol)
+    return RootIsolation(roots, resolved, singular, "interval-newton", touching)
+
+def _touching_roots(f, expr, sym, unresolved, a, b, min_width, tol, samples=65):
+    """Split unresolved intervals into those still open and the touching roots found in the others.
+
+    Only intervals where f does not change sign (a sign change already
+    proves a root, which refine_real_roots can certify) and that are no
+    wider than a few min_width are tried: wider ones come
+    from clusters such as sin(1/x) near 0, where a handful of Newton roots
+    would hide the rest. Newton's method converges slowly to a double root,
+    so the roots are sharpened as roots of f', which are simple there. A root
+    counts when its residual is below 1e-7 of the typical size of f over
+    [a, b]. An interval is dropped when the enclosures of f over its
+    pieces all exclude 0, as for x**x - 2 near 0.
+    """
+    narrow = [(u, v) for u, v in unresolved if v - u <= 4 * min_width]
+    if not narrow:
+        return unresolved, []
+    F = interval_function(expr, sym)
+    df = compile_derivative(expr, sym)
+    try:
+        d2f = compile_derivative(sp.diff(expr, sym), sym)
+    except ValueError:
+        d2f = None
+    ys = np.abs(_real_values(f, np.linspace(a, b, 257)))
+    scale = (np.median(ys[np.isfinite(ys)]) if np.isfinite(ys).any() else 0.0) + 1.0
+    still, touching = [], []
+    for u, v in unresolved:
+        edges = np.linspace(u, v, samples)
+        lows, highs, at_zero = edges[:-1], edges[1:], False
+        if u < 0 < v:
+            # The enclosure of x**x over a box touching 0 is [0, 1], so 0
+            # is left out of the boxes and checked on its own
+            left, right, tiny = edges[edges < 0], edges[edges > 0], np.nextafter(0.0, 1.0)
+            lows = np.concatenate([left[:-1], [left[-1], tiny], right[:-1]])
+            highs = np.concatenate([left[1:], [-tiny, right[0]], right[1:]])
+            at_zero = _real_values(f, np.zeros(1))[0] == 0
+        lo, hi = F(lows, highs)
+        if not at_zero and np.all((lo > 0) | (hi < 0)):
+            continue
+        found = np.empty(0)
+        ends = _real_values(f, np.array([u, v]))
+        if v - u <= 4 * min_width and not ends[0] * ends[1] < 0:
+            # Sample a little past the ends so a root on an edge is still a dip
+            xs = np.linspace(u - (v - u), v + (v - u), samples)
+            found = _dip_roots(f, df, xs, _real_values(f, xs), scale, tol)
+            if d2f is not None:
+                sharp = _newton(df, d2f, found, tol)
+                better = (np.abs(sharp - found) <= v - u) & (
+                    np.abs(_real_values(f, sharp)) <= np.abs(_real_values(f, found)))
+                found = np.where(better, sharp, found)
+            if u <= 0 <= v and _real_values(f, np.zeros(1))[0] == 0:
+                found = np.zeros(1)  # as in _refine_mp: Newton only gets near a multiple root at 0
+            found = found[(found >= u) & (found <= v)]
+            found = np.sort(found[np.abs(_real_values(f, found)) <= 1e-7 * scale])
+        if found.size:
+            keep = np.concatenate([[True], np.diff(found) > 1e-9 * (1 + np.abs(found[1:]))])
+            touching.extend(float(r) for r in found[keep])
+        else:
+            still.append((u, v))
+    return still, touching
+
+def certified_real_roots(expr, sym, interval=ROOT_INTERVAL, digits=None):
+    """Real roots as a SymPy set, with a method label.
+
+    Certified roots become Floats (enclosure midpoints, or certified to
+    digits significant digits when digits is given, see refine_real_roots).
+    Any unresolved interval stays in the answer as a ConditionSet over that
+    interval, so a root is never dropped silently. Touching roots found by
+    Newton's method are added too, and mark the label "certified+newton"
+    because they are not certified. Falls back to find_real_roots (label
+    "multistart") when the expression has no interval extension.
+    """
+    try:
+        with tracer.span("isolate"):
+            result = isolate_real_roots(expr, sym, interval)
+    except NotImplementedError:
+        roots = find_real_roots(expr, sym, interval, dps=digits if digits and digits > FLOAT_DIGITS else None)
+        return (sp.FiniteSet(*roots) if roots else sp.EmptySet), "multistart"
+    if digits:
+        with tracer.span("refine", digits=digits):
+            values, unresolved = refine_real_roots(expr, sym, result, digits, interval)
+    else:
+        values = [sp.Float(0.0 if lo <= 0 <= hi else (lo + hi) / 2) for lo, hi in result.roots]
+        unresolved = result.unresolved
+    if digits and digits > FLOAT_DIGITS and result.touching:
+        # A double root is a simple root of f', where mpmath converges fast
+        real = sp.Symbol(sym.name, real=True)
+        touching = _polish(sp.diff(expr.subs(sym, real), real), real, result.touching, digits)
+    else:
+        touching = [sp.Float(r) for r in result.touching]
+    tracer.count("isolate.roots", len(values))
+    tracer.count("isolate.touching", len(touching))
+    tracer.count("isolate.unresolved", len(unresolved))
+    solutions = sp.FiniteSet(*values, *touching)
+    method = "certified+newton" if touching else "certified"
+    if not unresolved:
+        return solutions, method
+    pending = [sp.ConditionSet(sym, sp.Eq(expr, 0), sp.Interval(sp.Float(lo), sp.Float(hi)))
+               for lo, hi in unresolved]
+    return sp.Union(solutions, *pending, evaluate=False), method + "-partial"
+
+# --- Adaptive precision ---
+FLOAT_DIGITS = 12         # significant digits the double-precision isolation is trusted to
+DISPLAY_DIGITS = 6        # default significant digits of numerical answers in the GUI
+PRECISION_MAX_DPS = 1000  # escalation stops here and leaves the root unresolved
+
+@functools.lru_cache(maxsize=256)
+def _mp_function(expr, sym):
+    """Cached mpmath f(x) and f'(x) for expr; f'(x) falls back to mpmath.diff."""
+    import mpmath
+    f = sp.lambdify(sym, expr, 'mpmath')
+    try:
+        real = sp.Symbol(sym.name, real=True)  # so that d|x|/dx is sign(x)
+        df = sp.lambdify(real, sp.diff(expr.subs(sym, real), real), 'mpmath')
+        df(mpmath.mpf("0.5"))
+    except Exception:
+        df = lambda x: mpmath.diff(f, x)
+    return f, df
+
+def _mp_real(f, x):
+    """f(x) as a finite real mpf, or None."""
+    import mpmath
+    try:
+        value = mpmath.mpmathify(f(x))
+    except (ValueError, TypeError, ZeroDivisionError, OverflowError):
+        return None
+    if isinstance(value, mpmath.mpc):
+        if value.imag != 0:
+            return None
+        value = value.real
+    return value if mpmath.isfinite(value) else None
+
+def _certify_digits(f, x, digits, dps):
+    """True if the root near x is pinned to digits significant digits.
+
+    f must change sign across x +- half a unit in the last requested digit
+    (or across a narrower bracket, when another root lies within that unit),
+    and evaluating again with 20 more digits must give the same signs and
+    nearly the same values, so rounding error cannot have faked the change.
+    """
+    import mpmath
+    for shrink in range(0, dps - digits - 4, 4):
+        values = []
+        for extra in (0, 20):
+            with mpmath.workdps(dps + extra):
+                half = mpmath.mpf(10) ** -(digits + shrink) * (abs(x) if x else 1) / 2
+                fa, fb = _mp_real(f, x - half), _mp_real(f, x + half)
+            if fa is None or fb is None:
+                return False
+            values.append((fa, fb))
+        (fa, fb), (ga, gb) = values
+        if abs(fa - ga) >= abs(ga) / 4 or abs(fb - gb) >= abs(gb) / 4:
+            return False  # rounding noise: narrower brackets will not help
+        if fa * fb < 0 and ga * gb < 0:
+            return True
+    return False
+
+def _refine_mp(f, df, lo, hi, digits):
+    """The root in [lo, hi] to digits digits, raising mpmath precision until certified.
+
+    Newton steps safeguarded by bisection while f changes sign across the
+    bracket; plain Newton from the midpoint otherwise. Precision starts at
+    digits + 10 and doubles up to 4 * digits + 50 (at most PRECISION_MAX_DPS).
+    Returns an mpf, or None if the root could not be certified. A bracket
+    around 0 where f(0) is exactly zero gives 0, which no relative accuracy
+    test can certify.
+    """
+    import mpmath
+    if lo <= 0 <= hi and _mp_real(f, mpmath.mpf(0)) == 0:
+        return mpmath.mpf(0)
+    dps = digits + 10
+    while dps <= min(4 * digits + 50, PRECISION_MAX_DPS):
+        tracer.count("precision.attempts")
+        with mpmath.workdps(dps):
+            a, b = mpmath.mpf(lo), mpmath.mpf(hi)
+            fa, fb = _mp_real(f, a), _mp_real(f, b)
+            bracketed = fa is not None and fb is not None and fa * fb < 0
+            x = (a + b) / 2
+            tol = mpmath.mpf(10) ** -(dps - 5)  # converge fully: certification may need a narrower bracket
+            for _ in range(10 + 4 * dps):
+                fx, dfx = _mp_real(f, x), _mp_real(df, x)
+                if fx is None or fx == 0:
+                    break
+                if bracketed:
+                    if (fx < 0) == (fa < 0):
+                        a, fa = x, fx
+                    else:
+                        b = x
+                step = fx / dfx if dfx else None
+                new = x - step if step is not None else (a + b) / 2
+                if bracketed and not a < new < b:
+                    new = (a + b) / 2
+                done = abs(new - x) <= tol * (abs(new) or 1) or (bracketed and b - a <= tol * abs(x))
+                x = new
+                if done:
+                    break
+        if fx is not None and _certify_digits(f, x, digits, dps):
+            tracer.count("precision.certified")
+            return x
+        dps *= 2
+    return None
+
+def _refine_polynomial(poly, a, b, digits):
+    """Real roots of poly in [a, b] to digits digits, exactly (rational interval refinement)."""
+    roots = []
+    for (s, t), _ in poly.intervals(inf=sp.Rational(a), sup=sp.Rational(b)):
+        if s != t:
+            s, t = poly.refine_root(s, t, eps=sp.Rational(1, 10 ** digits))
+        if s != t and (s > 0 or t < 0):
+            s, t = poly.refine_root(s, t, eps=min(abs(s), abs(t)) / (2 * 10 ** digits))
+        roots.append(sp.Float((s + t) / 2, max(digits, 15)))
+    return roots
+
+def _scan_mp(f, df, lo, hi, digits, samples=65, max_depth=8):
+    """Certified roots in [lo, hi] found by sampling f at high precision.
+
+    Every sign change between samples is refined with _refine_mp. The
+    deepest dip of |f| that does not change sign is sampled again, zoomed
+    in, up to max_depth times: that is where two close roots hide.
+    """
+    import mpmath
+    found = []
+    boxes = [(lo, hi)]
+    for _ in range(max_depth):
+        zoom = []
+        for a, b in boxes:
+            with mpmath.workdps(max(digits, 15) + 10):  # never coarser than the float isolation
+                xs = mpmath.linspace(mpmath.mpf(a), mpmath.mpf(b), samples)
+                ys = [_mp_real(f, x) for x in xs]
+            for i in range(samples - 1):
+                if ys[i] is not None and ys[i + 1] is not None and ys[i] * ys[i + 1] < 0:
+                    x = _refine_mp(f, df, xs[i], xs[i + 1], digits)
+                    if x is not None:
+                        found.append(x)
+            dips = [i for i in range(1, samples - 1)
+                    if None not in ys[i - 1:i + 2] and ys[i - 1] * ys[i + 1] > 0
+                    and abs(ys[i]) <= min(abs(ys[i - 1]), abs(ys[i + 1]))]
+            if dips:
+                i = min(dips, key=lambda j: abs(ys[j]))
+                zoom.append((xs[i - 1], xs[i + 1]))
+        boxes = zoom
+    return found
+
+def refine_real_roots(expr, sym, isolation, digits, interval=ROOT_INTERVAL):
+    """Turn an isolate_real_roots result into roots certified to digits digits.
+
+    Work is spent only where it is needed: an enclosure already narrower than
+    the requested accuracy is used as it is, and only the remaining roots go
+    to mpmath (see _refine_mp). Unresolved intervals are scanned at high
+    precision (see _scan_mp); certified roots found there replace the interval, and an
+    interval without any (e.g. a double root) stays unresolved. Polynomials
+    are refined with exact rational arithmetic instead. Returns
+    (roots as sp.Float, unresolved intervals).
+    """
+    if isolation.method == "descartes":
+        poly = sp.Poly(expr, sym, domain='QQ')
+        return _refine_polynomial(poly, interval[0], interval[1], digits), []
+    f, df = _mp_function(expr, sym)
+    accuracy = 10.0 ** -digits / 2
+    precision = max(digits, 15)  # keep roots that agree to digits digits apart
+    roots, unresolved = [], []
+    for lo, hi in isolation.roots:
+        if lo <= 0 <= hi and hi - lo <= accuracy:
+            roots.append(sp.Float(0))
+        elif digits <= FLOAT_DIGITS and hi - lo <= accuracy * min(abs(lo), abs(hi)):
+            roots.append(sp.Float((lo + hi) / 2, precision))
+        else:
+            tracer.count("precision.escalated")
+            x = _refine_mp(f, df, lo, hi, digits)
+            if x is None:
+                unresolved.append((lo, hi))
+            else:
+                roots.append(sp.Float(x, precision))
+    for lo, hi in isolation.unresolved:
+        tracer.count("precision.unresolved_scanned")
+        found = _scan_mp(f, df, lo, hi, digits)
+        if found:
+            roots.extend(sp.Float(x, precision) for x in found)
+        else:
+            unresolved.append((lo, hi))
+    return sorted(set(roots)), unresolved
+
+# --- Complex root finding ---
+ROOT_BOX = (-10.0, 10.0, -10.0, 10.0)  # default region for numerical complex roots: re_lo, re_hi, im_lo, im_hi
+COMPLEX_GRID = 15           # cells per side of the first counting grid (odd: the axes run through cell middles)
+COMPLEX_EDGE_SAMPLES = 64   # points per cell edge when following the argument of f
+COMPLEX_MAX_CELLS = 20000   # live cells before subdivision gives up
+COMPLEX_THREADS = os.cpu_count() or 1
+
+ComplexRoots = collections.namedtuple("ComplexRoots", "roots unresolved method")
+ComplexRoots.__doc__ = """Result of find_complex_roots.
+
+roots: complex roots (NumPy complex128). unresolved: (re_lo, re_hi, im_lo,
+im_hi) cells whose winding number says they hold roots that Newton's method
+could not pin down. method: "aberth", "argument-principle" or
+"complex-multistart".
+"""
+
+def root_box(interval=None):
+    """The region searched for complex roots, as (re_lo, re_hi, im_lo, im_hi).
+
+    interval is None (ROOT_BOX), a (lo, hi) pair for the square with those
+    bounds on both axes, or the four bounds themselves.
+    """
+    if interval is None:
+        return ROOT_BOX
+    if len(interval) == 2:
+        lo, hi = float(interval[0]), float(interval[1])
+        return lo, hi, lo, hi
+    return tuple(float(v) for v in interval)
+
+def holomorphic_parts(expr, sym):
+    """(numerator, denominator) of expr with an entire numerator, or None.
+
+    tan, sec and friends are written as quotients of sin/cos (sinh/cosh) and
+    everything is put over one denominator, so poles of expr are not
+    mistaken for roots: a winding number counts zeros minus poles. None when
+    expr uses anything but polynomials, sin, cos, sinh, cosh and exp of
+    polynomial-like arguments (branch cuts, essential singularities, poles
+    of special functions), where winding numbers do not count roots.
+    """
+    quotients = {
+        sp.tan: lambda a: sp.sin(a) / sp.cos(a), sp.cot: lambda a: sp.cos(a) / sp.sin(a),
+        sp.sec: lambda a: 1 / sp.cos(a), sp.csc: lambda a: 1 / sp.sin(a),
+        sp.tanh: lambda a: sp.sinh(a) / sp.cosh(a), sp.coth: lambda a: sp.cosh(a) / sp.sinh(a),
+        sp.sech: lambda a: 1 / sp.cosh(a), sp.csch: lambda a: 1 / sp.sinh(a),
+    }
+    for func, quotient in quotients.items():
+        expr = expr.replace(func, quotient)
+    num, den = sp.fraction(sp.together(expr))
+    entire = (sp.sin, sp.cos, sp.sinh, sp.cosh, sp.exp)
+    for part in (num, den):
+        for call in part.atoms(sp.Function):
+            if not isinstance(call, entire) or any(sp.denom(sp.together(a)).has(sym) for a in call.args):
+                return None
+        for power in part.atoms(sp.Pow):
+            if power.base.has(sym) and not power.exp.is_Integer:
+                return None
+    return num, den
+
+def _complex_function(expr, sym):
+    """Vectorized complex f(z): the compiled code, or mpmath point by point."""
+    f = compile_expression(expr, sym)
+    if f.backend != "mpmath":
+        return f
+    g = sp.lambdify(sym, expr, 'mpmath')
+    def point(z):
+        try:
+            return complex(g(complex(z)))
+        except Exception:
+            return complex(np.nan, np.nan)
+    return np.vectorize(point, otypes=[complex])
+
+def _complex_derivative(expr, sym):
+    """Vectorized complex f'(z), by central differences when the derivative cannot be compiled.
+
+    That happens for functions that are not complex differentiable, such as
+    Abs(z); the difference is then taken along the real axis, as
+    compile_derivative does for real roots.
+    """
+    try:
+        return _complex_function(sp.diff(expr, sym), sym)
+    except ValueError:
+        f = _complex_function(expr, sym)
+        def df(z, h=1e-7):
+            step = h * (1 + np.abs(z))
+            return (_complex_values(f, z + step) - _complex_values(f, z - step)) / (2 * step)
+        return df
+
+def _complex_values(f, z):
+    """f(z) as a complex array shaped like z (constant expressions give a scalar)."""
+    return np.broadcast_to(np.asarray(f(z), dtype=complex), np.shape(z))
+
+def aberth_roots(coeffs, tol=1e-14, max_iter=500):
+    """All complex roots of a polynomial by Aberth–Ehrlich iteration.
+
+    coeffs are highest degree first. Every estimate is updated at once with
+    NumPy: a Newton correction for p, pushed away from the other estimates
+    so no two converge to the same simple root. The estimates start on a
+    circle whose radius is the geometric mean of the root moduli, turned off
+    the axes. Roots at 0 are split off exactly beforehand.
+    """
+    c = np.trim_zeros(np.asarray(coeffs, dtype=complex), 'f')
+    trimmed = np.trim_zeros(c, 'b')
+    zeros = np.zeros(len(c) - len(trimmed), dtype=complex)
+    n = len(trimmed) - 1
+    if n < 1:
+        return zeros
+    c = trimmed / trimmed[0]
+    dc = np.polyder(c)
+    z = abs(c[-1]) ** (1.0 / n) * np.exp(1j * (2 * np.pi * np.arange(n) / n + 0.4))
+    active = np.ones(n, dtype=bool)
+    for _ in range(max_iter):
+        index = np.flatnonzero(active)
+        zi = z[index]
+        with np.errstate(all='ignore'):
+            ratio = np.polyval(c, zi) / np.polyval(dc, zi)
+            diff = zi[:, None] - z[None, :]
+            diff[np.arange(index.size), index] = np.inf
+            w = ratio / (1 - ratio * (1 / diff).sum(axis=1))
+        w = np.where(np.isfinite(w), w, 0)
+        z[index] = zi - w
+        active[index[np.abs(w) <= tol * np.abs(z[index])]] = False
+        if not active.any():
+            break
+    return np.concatenate([zeros, z])
+
+def _winding_numbers(F, cells, samples=COMPLEX_EDGE_SAMPLES):
+    """Winding number of F around each cell, and whether it can be trusted.
+
+    cells is an (n, 4) array of (re_lo, re_hi, im_lo, im_hi). F is sampled
+    counter-clockwise along the four edges. A count is trusted only if F is
+    finite and clearly non-zero on the boundary, its argument turns by less
+    than a quarter turn between samples and the total is close to whole turns.
+    """
+    t = np.linspace(0.0, 1.0, samples)[:-1]  # an edge's end point starts the next edge
+    a, b, c, d = (cells[:, k, None] for k in range(4))
+    corners = (a + 1j * c, b + 1j * c, b + 1j * d, a + 1j * d)
+    path = np.concatenate([p + (q - p) * t for p, q in zip(corners, corners[1:] + corners[:1])], axis=1)
+    values = _complex_values(F, path)
+    closed = np.concatenate([values, values[:, :1]], axis=1)
+    with np.errstate(all='ignore'):
+        steps = np.angle(closed[:, 1:] / closed[:, :-1])
+        magnitude = np.abs(values)
+        turns = steps.sum(axis=1) / (2 * np.pi)
+        counts = np.rint(turns)
+        ok = (np.isfinite(values).all(axis=1) & (np.abs(steps) < np.pi / 2).all(axis=1)
+              & (magnitude.min(axis=1) > 1e-12 * magnitude.max(axis=1))
+              & (np.abs(turns - counts) < 0.1))
+    return np.where(ok, counts, 0).astype(int), ok
+
+def _count_roots(F, cells):
+    """_winding_numbers over all cells, split across COMPLEX_THREADS threads for large grids.
+
+    NumPy (and numexpr) release the GIL inside their kernels, so threads
+    share the work without pickling the compiled function to processes.
+    """
+    chunks = min(COMPLEX_THREADS, len(cells) * 4 * COMPLEX_EDGE_SAMPLES // NUMEXPR_MIN_SIZE)
+    if chunks <= 1:
+        return _winding_numbers(F, cells)
+    with concurrent.futures.ThreadPoolExecutor(chunks) as pool:
+        parts = list(pool.map(lambda part: _winding_numbers(F, part), np.array_split(cells, chunks)))
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+def _split_cells(cells, split=0.5 - 2 ** -7):
+    """Quarter every cell, off-centre so roots rarely land on the new edges."""
+    a, b, c, d = cells.T
+    m, n = a + (b - a) * split, c + (d - c) * split
+    return np.concatenate([np.stack(quarter, axis=1) for quarter in
+                           ((a, m, c, n), (m, b, c, n), (a, m, n, d), (m, b, n, d))])
+
+def _newton_complex(F, dF, z, tol=1e-14, max_iter=60):
+    """Newton's method from every starting point at once. Returns (z, converged)."""
+    z = np.array(z, dtype=complex)
+    active = np.ones(z.shape, dtype=bool)
+    converged = np.zeros(z.shape, dtype=bool)
+    for _ in range(max_iter):
+        index = np.flatnonzero(active)
+        if not index.size:
+            break
+        zi = z[index]
+        with np.errstate(all='ignore'):
+            step = _complex_values(F, zi) / _complex_values(dF, zi)
+        bad = ~np.isfinite(step)
+        z[index] = zi - np.where(bad, 0, step)
+        done = np.abs(step) <= tol * (1 + np.abs(z[index]))
+        converged[index[done]] = True
+        active[index[done | bad]] = False
+    return z, converged
+
+def _inside(z, cells, margin=1e-9):
+    """True where z lies in its cell, widened by margin of the cell size."""
+    a, b, c, d = cells.T
+    pad_re, pad_im = (b - a) * margin, (d - c) * margin
+    return (z.real >= a - pad_re) & (z.real <= b + pad_re) & (z.imag >= c - pad_im) & (z.imag <= d + pad_im)
+
+def _cell_centres(cells):
+    return (cells[:, 0] + cells[:, 1]) / 2 + 1j * (cells[:, 2] + cells[:, 3]) / 2
+
+def _grid_cells(box, n):
+    """Roughly square cells covering box, n across its longer side (an odd number per side)."""
+    width, height = box[1] - box[0], box[3] - box[2]
+    size = min(max(width, height) / n, width, height)
+    n_re, n_im = (int(np.ceil(side / size - 1e-9)) | 1 for side in (width, height))
+    re = np.linspace(box[0], box[1], n_re + 1)
+    im = np.linspace(box[2], box[3], n_im + 1)
+    a, c = np.meshgrid(re[:-1], im[:-1])
+    b, d = np.meshgrid(re[1:], im[1:])
+    return np.stack([a.ravel(), b.ravel(), c.ravel(), d.ravel()], axis=1)
+
+def _argument_principle(F, dF, box, min_size):
+    """Roots of the entire function F in box by winding-number subdivision.
+
+    Cells holding no root are dropped; a cell holding exactly one gets a
+    Newton run from its centre, which must converge inside the cell. Cells
+    with several roots, an untrustworthy count or a Newton run that strays
+    are quartered, level by level, all cells of a level at once. Below
+    min_size a cell is handed to Newton as it is (a multiple root, a tight
+    cluster, or a root on its boundary, which is allowed to lie up to one
+    cell size outside) and reported unresolved if that fails.
+    """
+    cells = _grid_cells(box, COMPLEX_GRID)
+    found, unresolved = [], []
+    while len(cells):
+        if len(cells) > COMPLEX_MAX_CELLS:
+            unresolved.extend(map(tuple, cells))
+            break
+        tracer.count("complex.cells", len(cells))
+        with tracer.span("winding", cells=len(cells)):
+            counts, ok = _count_roots(F, cells)
+        single = ok & (counts == 1)
+        split = ~ok | (counts > 1) | (counts < 0)
+        if single.any():
+            z, converged = _newton_complex(F, dF, _cell_centres(cells[single]))
+            converged &= _inside(z, cells[single])
+            found.append(z[converged])
+            split[np.flatnonzero(single)[~converged]] = True
+        small = np.maximum(cells[:, 1] - cells[:, 0], cells[:, 3] - cells[:, 2]) <= min_size
+        last = split & small
+        if last.any():
+            z, converged = _newton_complex(F, dF, _cell_centres(cells[last]))
+            converged &= _inside(z, cells[last], margin=1.0)
+            found.append(z[converged])
+            unresolved.extend(map(tuple, cells[last][~converged]))
+        cells = _split_cells(cells[split & ~small])
+    return (np.concatenate(found) if found else np.zeros(0, dtype=complex)), unresolved
+
+def _unique_complex(z, tol=1e-9):
+    """z without near-duplicates, ordered by real then imaginary part."""
+    unique = []
+    for value in z[np.lexsort((z.imag, z.real))]:
+        if all(abs(value - u) > tol * (1 + abs(value)) for u in unique):
+            unique.append(value)
+    return np.array(unique, dtype=complex)
+
+def find_complex_roots(expr, sym, box=None):
+    """Complex roots of expr = 0 for sym, as a ComplexRoots.
+
+    Polynomials: every root, by aberth_roots on each square-free factor so
+    multiple roots come out once and accurately (only the roots in box if
+    one is given). Other expressions: the roots in box (default ROOT_BOX), counted
+    per cell with the argument principle and refined with Newton's method
+    (see _argument_principle), or, when expr is not holomorphic (see
+    holomorphic_parts), Newton runs from a grid of starting points with no
+    guarantee that every root is found. Candidates must also satisfy the
+    original expression: zeros of the numerator that are poles or removable
+    points of expr are dropped.
+    """
+    expr = sp.sympify(expr)
+    if expr.is_polynomial(sym):
+        with tracer.span("aberth"):
+            poly = sp.Poly(expr, sym)
+            factors = [f for f, _ in poly.sqf_list()[1]] if poly.domain.is_Exact else [poly]
+            roots = np.concatenate([np.zeros(0, dtype=complex)] +
+                                   [aberth_roots([complex(c) for c in f.all_coeffs()]) for f in factors])
+        if box is not None:
+            re_lo, re_hi, im_lo, im_hi = root_box(box)
+            roots = roots[(roots.real >= re_lo) & (roots.real <= re_hi)
+                          & (roots.imag >= im_lo) & (roots.imag <= im_hi)]
+        return ComplexRoots(_unique_complex(roots), [], "aberth")
+
+    box = root_box(box)
+    size = max(box[1] - box[0], box[3] - box[2])
+    parts = holomorphic_parts(expr, sym)
+    if parts is not None:
+        num = parts[0]
+        F, dF = _complex_function(num, sym), _complex_derivative(num, sym)
+        roots, unresolved = _argument_principle(F, dF, box, size * 1e-7)
+        method = "argument-principle"
+    else:
+        F, dF = _complex_function(expr, sym), _complex_derivative(expr, sym)
+        cells = _grid_cells(box, 2 * COMPLEX_GRID)
+        with tracer.span("complex-multistart", seeds=len(cells)):
+            roots, converged = _newton_complex(F, dF, _cell_centres(cells))
+        roots = roots[converged & _inside(roots, np.tile(box, (len(roots), 1)))]
+        unresolved = []
+        method = "complex-multistart"
+    if roots.size:
+        # A Newton step on expr itself must be negligible: this drops poles and removable points
+        f, df = _complex_function(expr, sym), _complex_derivative(expr, sym)
+        with np.errstate(all='ignore'):
+            step = np.abs(_complex_values(f, roots) / _complex_values(df, roots))
+        roots = roots[np.isfinite(step) & (step <= 1e-8 * (1 + np.abs(roots)))]
+    tracer.count("complex.roots", len(roots))
+    return ComplexRoots(_unique_complex(roots), unresolved, method)
+
+def _polish_complex(expr, sym, z, digits):
+    """Newton's method on z with mpmath at digits + 10 digits, or None if it does not settle."""
+    import mpmath
+    f, df = _mp_function(expr, sym)
+    with mpmath.workdps(digits + 10):
+        x = mpmath.mpc(z)
+        tol = mpmath.mpf(10) ** -(digits + 2)
+        for _ in range(10 + 4 * digits):
+            try:
+                step = f(x) / df(x)
+            except (ValueError, ZeroDivisionError, OverflowError):
+                return None
+            x -= step
+            if abs(step) <= tol * (1 + abs(x)):
+                return x
+    return None
+
+def _complex_float(z, precision=15):
+    """z as a SymPy number; a part lost in the rounding noise of |z| becomes exactly 0."""
+    re, im = (sp.re(z), sp.im(z)) if isinstance(z, sp.Basic) else (z.real, z.imag)
+    noise = (1 + abs(complex(z))) * 10.0 ** (2 - precision)
+    re, im = (sp.S.Zero if abs(part) <= noise else sp.Float(part, precision) for part in (re, im))
+    return re + sp.I * im
+
+def complex_root_set(expr, sym, interval=None, digits=None, imaginary=False):
+    """Complex (or, with imaginary, purely imaginary) roots as a SymPy set, with a method label.
+
+    See find_complex_roots. interval is a box as accepted by root_box.
+    digits above 15 polish every root with mpmath (polynomials use nroots
+    at that precision instead). Cells that could not be resolved stay in the
+    answer as ConditionSets over that rectangle, labelled "...-partial".
+    """
+    precision = max(digits or 15, 15)
+    if precision > 15 and expr.is_polynomial(sym):
+        with tracer.span("nroots"):
+            roots = sp.Poly(expr, sym).nroots(n=precision, maxsteps=50 + 2 * precision)
+        if interval is not None:
+            re_lo, re_hi, im_lo, im_hi = root_box(interval)
+            roots = [r for r in roots if re_lo <= sp.re(r) <= re_hi and im_lo <= sp.im(r) <= im_hi]
+        values = [_complex_float(r, precision) for r in roots]
+        unresolved, method = [], "nroots"
+    else:
+        result = find_complex_roots(expr, sym, interval)
+        unresolved, method = result.unresolved, result.method
+        values = []
+        for z in result.roots:
+            if precision > 15:
+                polished = _polish_complex(expr, sym, z, precision)
+                z = z if polished is None else polished
+            values.append(_complex_float(z, precision))
+    if imaginary:
+        values = [v for v in values if v != 0 and sp.re(v) == 0]
+    solutions = sp.FiniteSet(*values)
+    if not unresolved:
+        return solutions, method
+    pending = [sp.ConditionSet(sym, sp.Eq(expr, 0), sp.ComplexRegion(
+                   sp.Interval(sp.Float(a), sp.Float(b)) * sp.Interval(sp.Float(c), sp.Float(d))))
+               for a, b, c, d in unresolved]
+    return sp.Union(solutions, *pending, evaluate=False), method + "-partial"
+
+# --- Systems of equations ---
+SYSTEM_SEEDS = 64  # starting points for the numerical multivariate Newton
+
+def _keep_tuples(solutions, domain):
+    """Filter a FiniteSet of solution tuples to the requested domain."""
+    if not isinstance(solutions, sp.FiniteSet) or domain.lower() == "complex":
+        return solutions
+    if domain.lower() == "real":
+        keep = lambda v: v.is_real is not False
+    else:
+        keep = lambda v: v.is_imaginary is not False
+    return sp.FiniteSet(*[t for t in solutions if all(keep(v) for v in t)])
+
+def _linear_numeric(A, b):
+    """Solve A*x = b with NumPy; None if there is no unique numeric solution."""
+    # Copy only the nonzero entries: converting every SymPy element is the slow part
+    M = np.zeros(A.shape, dtype=complex)
+    rhs = np.zeros(b.shape[0], dtype=complex)
+    try:
+        for (i, j), v in A.todok().items():
+            M[i, j] = complex(v)
+        for (i, _), v in b.todok().items():
+            rhs[i] = complex(v)
+    except TypeError:
+        return None  # symbolic coefficients
+    solution, _, rank, _ = np.linalg.lstsq(M, rhs, rcond=None)
+    if rank < A.shape[1] or not np.allclose(M @ solution, rhs):
+        return None
+    return solution
+
+def _to_number(v, tol=1e-12):
+    """Convert a NumPy scalar to a SymPy number, chopping negligible parts."""
+    v = complex(v)
+    scale = tol * (1 + abs(v))
+    re = v.real if abs(v.real) > scale else 0.0
+    im = v.imag if abs(v.imag) > scale else 0.0
+    return sp.Float(re) + sp.Float(im) * sp.I if im else sp.Float(re)
+
+def newton_system(exprs, syms, seeds=SYSTEM_SEEDS, box=ROOT_INTERVAL, complex_domain=False,
+                  tol=1e-10, max_iter=80):
+    """Find solutions of exprs = 0 from many starting points at once.
+
+    F and its Jacobian are compiled once (see compile_expression); every seed in the box is iterated
+    together with Gauss-Newton steps computed from batched pseudo-inverses, so
+    singular or non-square Jacobians do not stop the batch. Converged points
+    are deduplicated by sorting. Returns an array of shape (k, len(syms)).
+    """
+    n, m = len(syms), len(exprs)
+    F = compile_expression(tuple(exprs), tuple(syms))
+    J = compile_expression(tuple(sp.Matrix(exprs).jacobian(syms)), tuple(syms))
+    rng = np.random.default_rng(0)
+    X = rng.uniform(box[0], box[1], (seeds, n))
+    if complex_domain:
+        X = X + 1j * rng.uniform(box[0], box[1], (seeds, n))
+    dtype = complex if complex_domain else float
+
+    def evaluate(func, X):
+        with np.errstate(all='ignore'):
+            values = func(*X.T)
+        return np.stack([np.broadcast_to(np.asarray(v, dtype=dtype), (X.shape[0],)) for v in values], axis=-1)
+
+    for _ in range(max_iter):
+        Fx = evaluate(F, X)
+        Jx = evaluate(J, X).reshape(X.shape[0], m, n)
+        alive = np.isfinite(Fx).all(axis=1) & np.isfinite(Jx).all(axis=(1, 2))
+        X, Fx, Jx = X[alive], Fx[alive], Jx[alive]
+        if X.shape[0] == 0:
+            return np.empty((0, n))
+        step = (np.linalg.pinv(Jx) @ Fx[..., None])[..., 0]
+        X = X - step
+        if np.all(np.abs(step) <= tol * (1 + np.abs(X))):
+            break
+
+    residual = np.abs(evaluate(F, X)).max(axis=1)
+    X = X[np.isfinite(residual) & (residual <= 1e-8)]
+    if X.size == 0:
+        return np.empty((0, n))
+    if not complex_domain:
+        X = X.real
+    # Deduplicate: round, sort lexicographically, keep rows that differ
+    key = np.round(np.concatenate([X.real, np.imag(X)], axis=1), 8) + 0.0
+    order = np.lexsort(key.T[::-1])
+    X, key = X[order], key[order]
+    keep = np.concatenate([[True], np.any(key[1:] != key[:-1], axis=1)])
+    return X[keep]
+
+def solve_system(equations, domain="real", numerical=False, symbols=None):
+    """Solve a system of equations for all unknowns at once.
+
+    Linear systems go to linsolve (sparse elimination) or, in numerical mode,
+    to a NumPy least-squares solve; nonlinear ones to nonlinsolve or, in
+    numerical mode, to newton_system, which also answers when nonlinsolve
+    exceeds its SymbolicBudget. Returns (FiniteSet of tuples ordered like
+    symbols, method used).
+    """
+    equations = tuple(equations)
+    if any(eq == sp.S.false for eq in equations):
+        return sp.EmptySet, "trivial"
+    equations = tuple(eq for eq in equations if eq != sp.S.true)
+    syms = tuple(symbols) if symbols else equation_symbols(equations)
+    exprs = [eq.lhs - eq.rhs for eq in equations]
+    if not exprs or not syms:
+        return sp.EmptySet, "trivial"
+
+    try:
+        A, b = sp.linear_eq_to_matrix(exprs, syms)
+        linear = True
+    except ValueError:  # sympy NonlinearError
+        linear = False
+
+    if numerical and linear:
+        solution = _linear_numeric(A, b)
+        if solution is not None:
+            return _keep_tuples(sp.FiniteSet(sp.Tuple(*map(_to_number, solution))), domain), "lstsq"
+        # Singular or parametric: solve exactly, then evaluate
+        solutions = sp.linsolve((A, b), syms)
+        if isinstance(solutions, sp.FiniteSet):
+            solutions = sp.FiniteSet(*[sp.Tuple(*[v.evalf() for v in t]) for t in solutions])
+        return _keep_tuples(solutions, domain), "linsolve"
+    if numerical:
+        roots = newton_system(exprs, syms, complex_domain=domain.lower() != "real")
+        tuples = [sp.Tuple(*map(_to_number, row)) for row in roots]
+        return _keep_tuples(sp.FiniteSet(*tuples), domain), "newton-system"
+
+    if linear:
+        return _keep_tuples(sp.linsolve((A, b), syms), domain), "linsolve"
+    try:
+        solutions = run_with_budget(sp.nonlinsolve, (exprs, syms), symbolic_budget(domain), is_heavy(exprs))
+    except SymbolicBudgetExceeded as e:
+        _budget_exceeded(e, equations, domain)
+        return solve_system(equations, domain, True, syms)[0], e.label
+    return _keep_tuples(solutions, domain), "nonlinsolve"
+
+# --- Plot sampling ---
+PLOT_RANGE = (-10.0, 10.0)
+
+def plot_function(expr, sym):
+    """Vectorized f(x) for plotting, compiled once per expression."""
+    return compile_expression(expr, sym)
+
+def adaptive_sample(f, a, b, initial=129, max_points=5000, tol=2e-3, max_depth=14):
+    """Sample f on [a, b], adding points only where the curve needs them.
+
+    Starts from a coarse uniform grid. Each pass evaluates the midpoint of
+    every interval still marked active, and keeps splitting intervals whose
+    midpoint strays from the chord by more than tol of the typical y-range, or
+    where f changes between defined and undefined. Afterwards every large jump
+    is checked once more: poles and step discontinuities get a NaN inserted so
+    the line is broken there instead of drawn as a vertical spike. Returns
+    (xs, ys, breaks) where breaks counts the discontinuities found.
+    """
+    xs = np.linspace(a, b, initial)
+    ys = _real_values(f, xs)
+    finite = ys[np.isfinite(ys)]
+    scale = 1.0
+    if finite.size >= 2:
+        lo, hi = np.percentile(finite, [5, 95])
+        scale = max(hi - lo, 1e-12)
+    active = np.ones(initial - 1, dtype=bool)
+    min_width = (b - a) / (initial - 1) / 2 ** max_depth
+
+    for _ in range(max_depth):
+        if not active.any() or xs.size >= max_points:
+            break
+        left = np.flatnonzero(active)
+        xm = 0.5 * (xs[left] + xs[left + 1])
+        ym = _real_values(f, xm)
+        y0, y1 = ys[left], ys[left + 1]
+        fin0, fin1, finm = np.isfinite(y0), np.isfinite(y1), np.isfinite(ym)
+        with np.errstate(all='ignore'):
+            bend = np.abs(ym - 0.5 * (y0 + y1)) > tol * scale
+        split = np.where(fin0 & fin1 & finm, bend, (fin0 != fin1) | (finm != fin0))
+        split &= (xs[left + 1] - xs[left]) > 2 * min_width
+
+        # Insert every evaluated midpoint; only the halves of split intervals
+        # stay active. Intervals are identified by their left endpoint.
+        n = xs.size
+        xs = np.concatenate([xs, xm])
+        ys = np.concatenate([ys, ym])
+        order = np.argsort(xs, kind='mergesort')
+        position = np.empty_like(order)
+        position[order] = np.arange(order.size)
+        xs, ys = xs[order], ys[order]
+        active = np.zeros(xs.size - 1, dtype=bool)
+        active[position[:n][left[split]]] = True
+        active[position[n:][split]] = True
+
+    # Break the line at poles and jump discontinuities
+    ys = np.where(np.isfinite(ys), ys, np.nan)
+    y0, y1 = ys[:-1], ys[1:]
+    with np.errstate(invalid='ignore'):
+        idx = np.flatnonzero(np.abs(y1 - y0) > 0.05 * scale)
+    breaks = 0
+    if idx.size:
+        y0, y1 = y0[idx], y1[idx]
+        ym = _real_values(f, 0.5 * (xs[idx] + xs[idx + 1]))
+        jump = np.abs(y1 - y0)
+        with np.errstate(invalid='ignore'):
+            outside = (ym < np.minimum(y0, y1) - 0.1 * jump) | (ym > np.maximum(y0, y1) + 0.1 * jump)
+            pole = (np.sign(y0) != np.sign(y1)) & (np.minimum(np.abs(y0), np.abs(y1)) > scale)
+            step = (np.abs(ym - y0) < 0.05 * jump) | (np.abs(ym - y1) < 0.05 * jump)
+        cut = idx[~np.isfinite(ym) | outside | pole | step]
+        if cut.size:
+            xs = np.insert(xs, cut + 1, 0.5 * (xs[cut] + xs[cut + 1]))
+            ys = np.insert(ys, cut + 1, np.nan)
+        breaks = int(cut.size)
+    return xs, ys, breaks
+
+# --- Solution cache ---
+CACHE_VERSION = 8  # bump when the solver's output changes to invalidate stored results
+CACHE_DIR = os.environ.get("BOTX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".botx"))
+
+class SolutionCache:
+    """Two-tier cache of solved equations: an in-memory LRU over an SQLite store.
+
+    Entries are keyed on the canonical form (srepr) of the parsed sp.Eq together
+    with the domain, numerical flag and requested digits, so different spellings of the same
+    equation share a result. The exact input text is also remembered in memory
+    so a repeated query can be answered without parsing at all. The disk store
+    is stamped with CACHE_VERSION and the SymPy version and is wiped when
+    either changes. Pass path=None for a memory-only cache.
+    """
+    def __init__(self, path=os.path.join(CACHE_DIR, "solutions.sqlite3"),
+                 max_memory=512, max_disk=20000):
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._puts = 0
+        self._db = None
+        if path:
+            try:
+                self._db = self._open(path)
+            except (OSError, sqlite3.Error):
+                self._db = None  # fall back to memory only
+
+    def _open(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                   "(key TEXT PRIMARY KEY, value BLOB, accessed REAL)")
+        db.execute("CREATE INDEX IF NOT EXISTS solutions_accessed ON solutions (accessed)")
+        version = f"{CACHE_VERSION}:{sp.__version__}"
+        row = db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != version:
+            db.execute("DELETE FROM solutions")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        db.commit()
+        return db
+
+    @staticmethod
+    def key(eq, domain, numerical, digits=None):
+        text = f"{sp.srepr(eq)}|{domain.lower()}|{int(bool(numerical))}"
+        if numerical and digits:
+            text += f"|{int(digits)}"
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _memory_get(self, key):
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def lookup(self, eq_str, domain, numerical, digits=None):
+        """Return (solutions, eq, method) for input text seen before, without parsing."""
+        value = self._memory_get(("text", eq_str, domain.lower(), bool(numerical), numerical and digits or None))
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def remember(self, eq_str, domain, numerical, record, digits=None):
+        """Record (solutions, eq, method) for this exact input text in memory."""
+        self._memory_put(("text", eq_str, domain.lower(), bool(numerical), numerical and digits or None), record)
+
+    def get(self, eq, domain, numerical, digits=None):
+        """Return the cached (solutions, method) for a parsed equation, or None."""
+        key = self.key(eq, domain, numerical, digits)
+        value = self._memory_get(key)
+        if value is None and self._db is not None:
+            try:
+                row = self._db.execute("SELECT value FROM solutions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self._db.execute("UPDATE solutions SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._memory_put(key, value)
+            except Exception:
+                value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, eq, domain, numerical, record, digits=None):
+        """Store (solutions, method) for a parsed equation in both tiers."""
+        key = self.key(eq, domain, numerical, digits)
+        self._memory_put(key, record)
+        if self._db is None:
+            return
+        try:
+            blob = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+            self._db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)", (key, blob, time.time()))
+            self._puts += 1
+            if self._puts % 64 == 0:
+                self._db.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions "
+                                 "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_disk,))
+            self._db.commit()
+        except Exception:
+            pass  # caching must never break solving
+
+    def clear(self):
+        self._memory.clear()
+        self.hits = self.misses = 0
+        if self._db is not None:
+            self._db.execute("DELETE FROM solutions")
+            self._db.commit()
+
+    def stats(self):
+        size = None
+        if self._db is not None:
+            size = self._db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses,
+                "memory_entries": len(self._memory), "disk_entries": size}
+
+_solution_cache = None
+
+def solution_cache():
+    """Return the process-wide SolutionCache, creating it on first use."""
+    global _solution_cache
+    if _solution_cache is None:
+        _solution_cache = SolutionCache()
+    return _solution_cache
+
+# --- Session history ---
+class SessionLog:
+    """Append-only log of every solved equation, grouped into sessions.
+
+    Each entry keeps the input text, domain and mode, the method, the parsed
+    equation and solutions as srepr, and what the chat showed: the LaTeX (with
+    the LatexRenderer key of its rendered image) or the numerical text. A
+    session can be replayed from these columns alone, without parsing or
+    solving anything. Inputs are indexed with an FTS5 trigram index when
+    SQLite has one, so substring search stays fast over years of history.
+    Entries are never changed or deleted. Pass path=None for memory only.
+    """
+    def __init__(self, path=os.path.join(CACHE_DIR, "history.sqlite3")):
+        self.fts = False
+        try:
+            self._db = self._open(path or ":memory:")
+        except (OSError, sqlite3.Error):
+            self._db = self._open(":memory:")  # history is lost on exit, solving still works
+
+    def _open(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, started REAL)")
+        db.execute("CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, session INTEGER, "
+                   "created REAL, input TEXT, domain TEXT, numerical INTEGER, method TEXT, "
+                   "equation TEXT, solutions TEXT, explanation TEXT, display TEXT, image TEXT)")
+        db.execute("CREATE INDEX IF NOT EXISTS entries_session ON entries (session, id)")
+        try:
+            db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5"
+                       "(input, content='entries', content_rowid='id', tokenize='trigram')")
+            db.execute("CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN "
+                       "INSERT INTO entries_fts (rowid, input) VALUES (new.id, new.input); END")
+            self.fts = True
+        except sqlite3.Error:
+            pass  # no FTS5 or trigram tokenizer: search scans the table instead
+        db.commit()
+        return db
+
+    def start_session(self):
+        """Open a new session and return its id."""
+        cursor = self._db.execute("INSERT INTO sessions (started) VALUES (?)", (time.time(),))
+        self._db.commit()
+        return cursor.lastrowid
+
+    def append(self, session, eq_str, domain, numerical, equation, solutions, method,
+               explanation, display, image=None):
+        """Log one solved equation; returns the entry id, or None if it could not be written."""
+        try:
+            cursor = self._db.execute(
+                "INSERT INTO entries (session, created, input, domain, numerical, method, equation, "
+                "solutions, explanation, display, image) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session, time.time(), eq_str, domain, int(bool(numerical)), method,
+                 sp.srepr(equation), sp.srepr(solutions), explanation, display, image))
+            self._db.commit()
+            return cursor.lastrowid
+        except sqlite3.Error:
+            return None  # history must never break solving
+
+    def sessions(self, limit=50):
+        """Most recent sessions first, with their entry count and first input."""
+        return [dict(row) for row in self._db.execute(
+            "SELECT s.id, s.started, COUNT(e.id) AS entries, "
+            "(SELECT input FROM entries WHERE session = s.id ORDER BY id LIMIT 1) AS first "
+            "FROM sessions s JOIN entries e ON e.session = s.id "
+            "GROUP BY s.id ORDER BY s.id DESC LIMIT ?", (limit,))]
+
+    def entries(self, session):
+        """Every entry of a session, oldest first, without the srepr columns (see entry())."""
+        return [dict(row) for row in self._db.execute(
+            "SELECT id, session, created, input, domain, numerical, method, explanation, display, image "
+            "FROM entries WHERE session = ? ORDER BY id", (session,))]
+
+    def entry(self, entry_id):
+        row = self._db.execute("SELECT * FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def search(self, text, limit=200):
+        """Entries whose input contains text (case-insensitive), newest first."""
+        text = text.strip()
+        if not text:
+            return [dict(row) for row in self._db.execute(
+                "SELECT * FROM entries ORDER BY id DESC LIMIT ?", (limit,))]
+        if self.fts and len(text) >= 3:
+            query = '"' + text.replace('"', '""') + '"'
+            rows = self._db.execute(
+                "SELECT e.* FROM entries_fts f JOIN entries e ON e.id = f.rowid "
+                "WHERE entries_fts MATCH ? ORDER BY e.id DESC LIMIT ?", (query, limit))
+        else:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = self._db.execute("SELECT * FROM entries WHERE input LIKE ? ESCAPE '\\' "
+                                    "ORDER BY id DESC LIMIT ?", (pattern, limit))
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def load(entry):
+        """(solutions, equation) of an entry, rebuilt from srepr."""
+        equation = sp.sympify(entry["equation"])
+        if isinstance(equation, sp.Tuple):
+            equation = tuple(equation)  # a system
+        return sp.sympify(entry["solutions"]), equation
+
+_session_log = None
+
+def session_log():
+    """Return the process-wide SessionLog, creating it on first use."""
+    global _session_log
+    if _session_log is None:
+        _session_log = SessionLog()
+    return _session_log
+
+# --- Background solver engine ---
+SOLVE_TIMEOUT = 30.0   # seconds a single solve may run before it is abandoned
+SOLVER_POLL_MS = 16    # how often the GUI checks for finished solves
+
+def _solver_worker(conn):
+    """Worker process loop: run (job_id, func, args) jobs and send back results.
+
+    Sends None once warm, so the engine does not start a job's clock while
+    SymPy is still loading.
+    """
+    warm_solver()
+    try:
+        conn.send(None)
+    except (OSError, ValueError):
+        return
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        job_id, func, args = job
+        try:
+            result = ("ok", func(*args))
+        except Exception as e:
+            result = ("error", (type(e).__name__, str(e)))
+        try:
+            conn.send((job_id,) + result)
+        except Exception as e:
+            # Result could not be pickled back to the parent
+            conn.send((job_id, "error", (type(e).__name__, str(e))))
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.job_id = None
+        self.deadline = None
+        self.ready = False  # set when the worker reports that warm_solver() is done
+
+class SolverJobEngine:
+    """Pool of warm worker processes that run solver jobs off the Tk thread.
+
+    SymPy is pure Python and holds the GIL, so jobs run in separate processes.
+    submit() queues a job and returns its id; poll() never blocks and returns
+    finished jobs as (job_id, status, payload) with status "ok", "error",
+    "timeout" or "cancelled". Jobs only go to workers that have finished
+    warming up, so a job's timeout never includes a cold start. A job that
+    times out or is cancelled while running has its worker terminated and
+    replaced. Call from a single thread.
+    """
+    def __init__(self, max_workers=None, timeout=SOLVE_TIMEOUT):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.results = queue.Queue()
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ids = itertools.count(1)
+        self._pending = collections.deque()
+        self._workers = [self._start_worker() for _ in range(self.max_workers)]
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_solver_worker, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _restart_worker(self, index):
+        worker = self._workers[index]
+        worker.process.terminate()
+        worker.process.join(1)
+        worker.conn.close()
+        self._workers[index] = self._start_worker()
+
+    def submit(self, func, *args, timeout=None):
+        """Queue func(*args) to run in a worker process and return the job id."""
+        job_id = next(self._ids)
+        self._pending.append((job_id, func, args, self.timeout if timeout is None else timeout))
+        self._dispatch()
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns True if the job was found."""
+        for job in self._pending:
+            if job[0] == job_id:
+                self._pending.remove(job)
+                self.results.put((job_id, "cancelled", None))
+                return True
+        for i, worker in enumerate(self._workers):
+            if worker.job_id == job_id:
+                self._restart_worker(i)
+                self.results.put((job_id, "cancelled", None))
+                self._dispatch()
+                return True
+        return False
+
+    def active_count(self):
+        """Number of jobs queued or running."""
+        return len(self._pending) + sum(1 for w in self._workers if w.job_id is not None)
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._pending:
+                break
+            if worker.job_id is not None or not worker.ready:
+                continue
+            job_id, func, args, timeout = self._pending.popleft()
+            worker.conn.send((job_id, func, args))
+            worker.job_id = job_id
+            worker.deadline = time.monotonic() + timeout if timeout else None
+
+    def poll(self):
+        """Collect finished jobs, enforce timeouts and start queued jobs."""
+        now = time.monotonic()
+        for i, worker in enumerate(self._workers):
+            if not worker.ready:
+                try:
+                    if worker.conn.poll():
+                        worker.conn.recv()
+                        worker.ready = True
+                        continue
+                except (EOFError, OSError):
+                    pass
+                if not worker.process.is_alive():
+                    self._restart_worker(i)
+                continue
+            if worker.job_id is None:
+                continue
+            job_id = worker.job_id
+            try:
+                if worker.conn.poll():
+                    _, status, payload = worker.conn.recv()
+                    worker.job_id = worker.deadline = None
+                    self.results.put((job_id, status, payload))
+                    continue
+            except (EOFError, OSError):
+                pass
+            if not worker.process.is_alive():
+                self._restart_worker(i)
+                self.results.put((job_id, "error", ("WorkerError", "Solver process exited unexpectedly")))
+            elif worker.deadline is not None and now > worker.deadline:
+                self._restart_worker(i)
+                self.results.put((job_id, "timeout", None))
+        self._dispatch()
+
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
 
-        # If we get nothing useful, try nsolve numerically
-        if isinstance(sol, sp.ConditionSet) or sol == sp.EmptySet:
+    def shutdown(self):
+        """Stop all workers, discarding queued and running jobs."""
+        self._pending.clear()
+        for worker in self._workers:
             try:
-                # Try a few initial guesses to catch multiple roots
-                numeric_solutions = []
-                for guess in [0.1, 1, 2, 5, 10]:
-                    try:
-                        nsol = sp.nsolve(eq, sym, guess)
-                        if nsol not in numeric_solutions:
-                            numeric_solutions.append(nsol)
-                    except:
-                        pass
-                if numeric_solutions:
-                    sol = sp.FiniteSet(*numeric_solutions)
-            except Exception:
+                worker.conn.send(None)
+            except (OSError, ValueError):
                 pass
+        for worker in self._workers:
+            worker.process.join(0.5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        self._workers = []
 
-        if filter_imag and isinstance(sol, (sp.FiniteSet, set)):
-            sol = sp.FiniteSet(*[s for s in sol if s.is_imaginary])
+# --- Batch solving ---
+def _format_solutions(solutions, digits=None):
+    """Solutions as a list of strings, or a single string for infinite sets."""
+    def number(c, n):
+        if not c.is_number:
+            return c.evalf(n)
+        # Both parts get the digits of a real root; evalf leaves e.g. 1.0*I alone
+        re, im = (sp.Float(part, n) for part in c.as_real_imag())
+        if not im:
+            return re
+        return im * sp.I if not re else re + im * sp.I
+    def fmt(s):
+        if not digits or not s.has(sp.Float):
+            return s
+        if isinstance(s, sp.Tuple):  # systems are solved in double precision
+            return sp.Tuple(*(number(c, min(digits, 15)) for c in s))
+        return number(s, digits)
+    if isinstance(solutions, sp.FiniteSet) or solutions == sp.EmptySet:
+        # full_prec keeps trailing zeros of Floats nested in I*y or x + I*y
+        return [sp.sstr(fmt(s), full_prec=True) if digits else str(s) for s in solutions]
+    return str(solutions)
 
-        solutions.append(sol)
+def solve_record(eq_str, domain="real", numerical=False, line=None, interval=None, digits=None):
+    """Solve one equation string and return a JSON-friendly result record."""
+    record = {"line": line, "input": eq_str, "domain": domain, "numerical": numerical}
+    start = time.perf_counter()
+    try:
+        details = solve_details(normalize_input(eq_str), domain, numerical, interval=interval, digits=digits)
+        record.update(solutions=_format_solutions(details["solutions"], numerical and digits),
+                      symbols=[str(s) for s in details["symbols"]],
+                      method=details["method"], cached=details["cached"], error=None)
+    except Exception as e:
+        record.update(solutions=None, symbols=None, method=None, cached=False,
+                      error=f"{type(e).__name__}: {e}")
+    record["elapsed"] = round(time.perf_counter() - start, 6)
+    return record
 
-    if len(solutions) == 1:
-        return solutions[0]
-    return solutions
+def _failed_record(eq_str, domain, numerical, line, status, payload, timeout=None):
+    """Record for a job that did not finish ("error", "timeout" or "cancelled")."""
+    error = "timed out" if status == "timeout" else ": ".join(payload or (status,))
+    return {"line": line, "input": eq_str, "domain": domain, "numerical": numerical,
+            "solutions": None, "symbols": None, "method": None, "cached": False,
+            "error": error, "elapsed": timeout if status == "timeout" else None}
 
-def get_solution(eq_str, domain="real", numerical=False):
-    x = sp.symbols('x')
-    if '=' in eq_str:
-        lhs_str, rhs_str = eq_str.split('=', 1)
-        lhs = sp.sympify(lhs_str.strip())
-        rhs = sp.sympify(rhs_str.strip())
-        eq = sp.Eq(lhs, rhs)
-    else:
-        expr = sp.sympify(eq_str, evaluate=False)
-        eq = sp.Eq(expr, 0)
+def solve_many(equations, domain="real", numerical=False, jobs=1, timeout=None, interval=None, digits=None):
+    """Solve an iterable of equation strings, yielding records as they finish.
+
+    Blank lines and lines starting with '#' are skipped. With jobs > 1 (or a
+    timeout) equations are solved in a SolverJobEngine and records arrive in
+    completion order; each record carries its 1-based "line" number. Only a
+    small window of equations is read ahead, so memory stays bounded however
+    long the input is.
+    """
+    numbered = ((n, text.strip()) for n, text in enumerate(equations, 1))
+    numbered = ((n, text) for n, text in numbered if text and not text.startswith('#'))
     
-    if numerical:
-        # Force numerical solving with multiple guesses
-        numeric_sols = []
-        guesses = [-10, -5, -2, -1, -0.5, 0, 0.5, 1, 2, 5, 10]
-        for guess in guesses:
-            try:
-                # For complex domains, use complex guess if needed
-                if domain.lower() == "complex":
-                    guess = complex(guess, 0)
-                sol = sp.nsolve(eq, x, guess)
-                # Check for duplicates (with tolerance)
-                if all(abs(sol - existing) > 1e-6 for existing in numeric_sols):
-                    numeric_sols.append(sol)
-            except:
-                pass
-        solutions = sp.FiniteSet(*numeric_sols) if numeric_sols else sp.EmptySet
-    else:
-        solutions = solveX(eq, x, domain)
-    return solutions, eq
+    if jobs <= 1 and timeout is None:
+        for n, text in numbered:
+            yield solve_record(text, domain, numerical, n, interval, digits)
+        return
+    
+    engine = SolverJobEngine(max_workers=jobs, timeout=timeout)
+    window = max(1, jobs) * 4
+    in_flight = {}
+    try:
+        exhausted = False
+        while not exhausted or in_flight:
+            while not exhausted and len(in_flight) < window:
+                item = next(numbered, None)
+                if item is None:
+                    exhausted = True
+                    break
+                n, text = item
+                if tracer.enabled:
+                    job_id = engine.submit(traced_call, None, solve_record, text, domain, numerical, n,
+                                           interval, digits)
+                else:
+                    job_id = engine.submit(solve_record, text, domain, numerical, n, interval, digits)
+                in_flight[job_id] = (n, text)
+            finished = engine.poll()
+            if not finished:
+                time.sleep(0.005)
+            for job_id, status, payload in finished:
+                n, text = in_flight.pop(job_id)
+                if status == "ok" and tracer.enabled:
+                    payload, trace, _ = payload
+                    tracer.merge(trace)
+                if status == "ok":
+                    yield payload
+                else:
+                    yield _failed_record(text, domain, numerical, n, status, payload, timeout)
+    finally:
+        engine.shutdown()
+
+# --- HTTP solve service ---
+SERVE_PORT = 8765
+SERVE_MAX_QUEUE = 256      # unique solves queued or running before requests are refused
+SERVE_MAX_BODY = 1 << 20   # bytes
+SERVE_MAX_BATCH = 1000     # equations per /solve/batch request
+
+class SolveService:
+    """Local HTTP/JSON front end for a warm SolverJobEngine.
+
+    POST /solve takes {"equation", "domain", "numerical", "interval", "digits",
+    "timeout"} (interval may also be a complex box [re_lo, re_hi, im_lo, im_hi]) and
+    returns a solve_record() dict. POST /solve/batch takes {"equations": [...]}
+    plus the same options and returns {"results": [...]} in input order.
+    GET /metrics reports throughput, latency percentiles and queue state.
+
+    Identical requests (same normalized equation, domain and mode) that are
+    in flight share one job. When more than max_queue unique solves are
+    pending, new work gets 503 with Retry-After instead of queueing without
+    bound. Each job is limited by its timeout (capped at the server's) and
+    times out with 504.
+    """
+    def __init__(self, workers=None, timeout=SOLVE_TIMEOUT, max_queue=SERVE_MAX_QUEUE):
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self.engine = SolverJobEngine(max_workers=workers, timeout=timeout)
+        self._inflight = {}   # (equation, domain, numerical) -> asyncio.Future
+        self._jobs = {}       # job_id -> (key, timeout)
+        self._wakeup = None
+        self.started = time.time()
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=2048)   # seconds, most recent requests
+        self.completions = collections.deque(maxlen=8192)  # finish times, for throughput
+
+    async def solve(self, eq_str, domain="real", numerical=False, timeout=None, interval=None, digits=None):
+        """Solve through the worker pool; returns (HTTP status, record)."""
+        text = normalize_input(eq_str)
+        key = (text, domain, bool(numerical), interval, digits)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+        else:
+            if len(self._inflight) >= self.max_queue:
+                self.counters["rejected"] += 1
+                return 503, None
+            limit = self.timeout if timeout is None else min(float(timeout), self.timeout)
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            job_id = self.engine.submit(solve_record, text, domain, bool(numerical), None, interval, digits,
+                                        timeout=limit)
+            self._jobs[job_id] = (key, limit)
+            self.counters["solves"] += 1
+            self._wakeup.set()
+        status, record = await asyncio.shield(future)
+        return status, dict(record, input=eq_str)
+
+    async def _poll_engine(self):
+        """Hand finished jobs to their futures; sleeps while nothing is running."""
+        while True:
+            if not self._jobs:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            for job_id, status, payload in self.engine.poll():
+                key, limit = self._jobs.pop(job_id)
+                future = self._inflight.pop(key)
+                if status == "ok":
+                    result = (200, payload)
+                else:
+                    self.counters[status] += 1
+                    result = (504 if status == "timeout" else 500,
+                              _failed_record(key[0], key[1], key[2], None, status, payload, limit))
+                if not future.done():
+                    future.set_result(result)
+            await asyncio.sleep(0.002)
+
+    def _options(self, body):
+        domain = body.get("domain", "real")
+        if domain not in ("real", "complex", "imaginary"):
+            raise ValueError(f"unknown domain {domain!r}")
+        interval = body.get("interval")
+        if interval is not None:
+            if (not isinstance(interval, list) or len(interval) not in (2, 4)
+                    or not all(isinstance(v, (int, float)) for v in interval)
+                    or not all(lo < hi for lo, hi in zip(interval[::2], interval[1::2]))):
+                raise ValueError("'interval' must be [lo, hi] or, for complex roots, "
+                                 "[re_lo, re_hi, im_lo, im_hi] with each lo < hi")
+            interval = tuple(float(v) for v in interval)
+        digits = body.get("digits")
+        if digits is not None and (not isinstance(digits, int) or isinstance(digits, bool)
+                                   or not 1 <= digits <= PRECISION_MAX_DPS):
+            raise ValueError(f"'digits' must be an integer from 1 to {PRECISION_MAX_DPS}")
+        timeout = body.get("timeout")
+        if timeout is not None:
+            if (not isinstance(timeout, (int, float)) or isinstance(timeout, bool)
+                    or not math.isfinite(timeout) or timeout <= 0):
+                raise ValueError("'timeout' must be a positive number of seconds")
+            timeout = min(float(timeout), self.timeout)
+        return domain, bool(body.get("numerical", False)), timeout, interval, digits
+
+    async def route(self, method, path, body):
+        """Return (HTTP status, JSON-friendly response) for one request."""
+        if path in ("/metrics", "/health"):
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, self.metrics() if path == "/metrics" else {"status": "ok"}
+        if path not in ("/solve", "/solve/batch"):
+            return 404, {"error": f"no such endpoint: {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            body = json.loads(body or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("expected a JSON object")
+            domain, numerical, timeout, interval, digits = self._options(body)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        if path == "/solve":
+            equation = body.get("equation")
+            if not isinstance(equation, str) or not equation.strip():
+                return 400, {"error": "missing 'equation'"}
+            status, record = await self.solve(equation, domain, numerical, timeout, interval, digits)
+            if status == 503:
+                return 503, {"error": "solver queue is full, retry later"}
+            record.pop("line", None)
+            return status, record
+
+        equations = body.get("equations")
+        if not isinstance(equations, list) or not all(isinstance(e, str) for e in equations):
+            return 400, {"error": "'equations' must be a list of strings"}
+        if len(equations) > SERVE_MAX_BATCH:
+            return 413, {"error": f"at most {SERVE_MAX_BATCH} equations per batch"}
+        keys = {(normalize_input(e), domain, numerical, interval, digits) for e in equations}
+        if len(keys) > self.max_queue:
+            # Would never fit in the queue, however long the client waits
+            return 413, {"error": f"at most {self.max_queue} different equations per batch"}
+        new = keys - self._inflight.keys()
+        if len(self._inflight) + len(new) > self.max_queue:
+            self.counters["rejected"] += 1
+            return 503, {"error": "solver queue is full, retry later"}
+        results = await asyncio.gather(*(self.solve(e, domain, numerical, timeout, interval, digits)
+                                         for e in equations))
+        # Concurrent requests may have filled the queue since the check above
+        records = [dict(record, line=n) if status != 503
+                   else _failed_record(e, domain, numerical, n, "overloaded", None)
+                   for n, (e, (status, record)) in enumerate(zip(equations, results), 1)]
+        return 200, {"results": records}
+
+    def metrics(self):
+        now = time.time()
+        latencies = sorted(self.latencies)
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3) if latencies else None
+        recent = sum(1 for t in self.completions if now - t <= 60)
+        return {
+            "uptime_s": round(now - self.started, 1),
+            "workers": self.engine.max_workers,
+            "queue_depth": self.engine.active_count(),
+            "in_flight": len(self._inflight),
+            "max_queue": self.max_queue,
+            "requests": dict(self.counters),
+            "throughput_rps_1m": round(recent / min(60.0, max(now - self.started, 1e-9)), 3),
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95),
+                           "p99": percentile(0.99), "max": percentile(1.0)},
+        }
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 connection (keep-alive supported)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > SERVE_MAX_BODY:
+                    await self._respond(writer, 413, {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                start = time.perf_counter()
+                path = target.split("?", 1)[0].rstrip("/") or "/"
+                try:
+                    status, response = await self.route(method, path, body)
+                except Exception as e:
+                    status, response = 500, {"error": f"{type(e).__name__}: {e}"}
+                self.counters["total"] += 1
+                self.counters[f"http_{status}"] += 1
+                if path.startswith("/solve") and status != 503:
+                    self.latencies.append(time.perf_counter() - start)
+                    self.completions.append(time.time())
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 500: "Internal Server Error",
+                  503: "Service Unavailable", 504: "Gateway Timeout"}.get(status, "")
+        head = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=SERVE_PORT, ready=None):
+        """Run until cancelled. ready(host, port) is called once listening."""
+        self._wakeup = asyncio.Event()
+        poller = asyncio.create_task(self._poll_engine())
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            if ready:
+                ready(*server.sockets[0].getsockname()[:2])
+            async with server:
+                await server.serve_forever()
+        finally:
+            poller.cancel()
+            self.engine.shutdown()
+
+# --- LaTeX rendering ---
+LATEX_FONT_SIZE = 16
+LATEX_DPI = 100
+
+class LatexRenderer:
+    """Renders LaTeX to RGBA pixels through a single reused Agg figure.
+
+    Results are cached by content (LaTeX string, font size and DPI) in an
+    in-memory LRU and, when cache_dir is given, as PNG files on disk. The
+    display path never encodes or decodes PNG: render() returns raw
+    (width, height, rgba_bytes) straight from the Agg buffer. Rendering is
+    serialized by a lock, so render() may be called from a worker thread.
+    """
+    def __init__(self, font_size=LATEX_FONT_SIZE, dpi=LATEX_DPI, cache_dir=None,
+                 max_memory=256, pad=8):
+        self.font_size = font_size
+        self.dpi = dpi
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.pad = pad
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._figure = None
+        self._canvas = None
+
+    def key(self, latex_str):
+        return hashlib.sha1(f"{latex_str}|{self.font_size}|{self.dpi}".encode()).hexdigest()
+
+    def cached(self, latex_str):
+        """Return the cached render for latex_str, or None."""
+        key = self.key(latex_str)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+        return image
+
+    def render(self, latex_str):
+        """Return (width, height, rgba_bytes) for latex_str. Raises on bad LaTeX."""
+        key = self.key(latex_str)
+        image = self.cached(latex_str)
+        if image is not None:
+            tracer.count("latex.hit.memory")
+        else:
+            image = self._load(key)
+            tracer.count("latex.hit.disk" if image is not None else "latex.miss")
+        if image is None:
+            with tracer.span("latex.draw"), self._lock:
+                image = self._draw(latex_str)
+            self._save(key, image)
+        with self._lock:
+            self._memory[key] = image
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+        return image
+
+    def _draw(self, latex_str):
+        if self._figure is None:
+            self._figure = mpl_figure.Figure(dpi=self.dpi)
+            self._canvas = backend_agg.FigureCanvasAgg(self._figure)
+        fig = self._figure
+        fig.clear()
+        text = fig.text(0, 0, f"${latex_str}$", fontsize=self.font_size)
+        # Measure once, then size the figure to fit the text exactly
+        extent = text.get_window_extent(self._canvas.get_renderer())
+        width = int(extent.width) + 2 * self.pad
+        height = int(extent.height) + 2 * self.pad
+        fig.set_size_inches(width / self.dpi, height / self.dpi)
+        text.set_position(((self.pad - extent.x0) / width, (self.pad - extent.y0) / height))
+        self._canvas.draw()
+        buffer = self._canvas.buffer_rgba()
+        return buffer.shape[1], buffer.shape[0], bytes(buffer)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with Image.open(self._path(key)) as png:
+                png = png.convert("RGBA")
+                return png.width, png.height, png.tobytes()
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key, image):
+        if not self.cache_dir:
+            return
+        try:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            width, height, data = image
+            Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", 0, 1).save(path)
+        except OSError:
+            pass
+
+# --- Chat transcript ---
+TRANSCRIPT_RETENTION = 1000  # messages kept in memory before older ones are paged to disk
+TRANSCRIPT_OVERSCAN = 400    # pixels above and below the viewport kept realized as widgets
+
+class _HeightIndex:
+    """Fenwick tree over message heights: prefix offsets and lookups in O(log n)."""
+    def __init__(self, heights=()):
+        self.heights = list(heights)
+        self._tree = [0] + self.heights
+        for i in range(1, len(self._tree)):
+            j = i + (i & -i)
+            if j < len(self._tree):
+                self._tree[j] += self._tree[i]
+
+    def __len__(self):
+        return len(self.heights)
+
+    def offset(self, index):
+        """Sum of the heights of all messages before index."""
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def total(self):
+        return self.offset(len(self.heights))
+
+    def append(self, height):
+        n = len(self.heights) + 1
+        self.heights.append(height)
+        self._tree.append(height + self.offset(n - 1) - self.offset(n - (n & -n)))
+
+    def set(self, index, height):
+        delta = height - self.heights[index]
+        self.heights[index] = height
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, y):
+        """Index of the message covering offset y (len(self) if past the end)."""
+        pos = 0
+        step = 1 << len(self.heights).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= y:
+                pos = nxt
+                y -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+class ChatTranscript:
+    """Virtualized chat history drawn on a Tk canvas.
+
+    Messages are plain dicts in a list; only those within overscan pixels of
+    the viewport are realized as widgets (via the build callback) and placed
+    with canvas.create_window. Heights start as estimates and are replaced by
+    measured ones the first time a message is realized; offsets come from a
+    _HeightIndex, so adding, updating and scrolling cost O(log n) whatever the
+    session length. Frames of recyclable kinds are pooled and handed back to
+    build() for reuse instead of being destroyed. Past retention, the oldest
+    messages are pickled in chunks to a temporary file, and a "load earlier"
+    header (built by build_header) pages them back in, newest chunk first.
+    """
+    def __init__(self, canvas, build, build_header, estimate, recyclable=(),
+                 retention=TRANSCRIPT_RETENTION, overscan=TRANSCRIPT_OVERSCAN):
+        self.canvas = canvas
+        self.build = build
+        self.build_header = build_header
+        self.estimate = estimate
+        self.recyclable = set(recyclable)
+        self.retention = retention
+        self.overscan = overscan
+        self.messages = []
+        self._heights = _HeightIndex()
+        self._first_seq = 0
+        self._next_seq = 0
+        self._realized = {}  # message index -> (frame, canvas item)
+        self._pool = collections.defaultdict(list)
+        self._page_file = None
+        self._chunks = []    # file offsets of paged-out chunks, oldest first
+        self._header = None  # (frame, canvas item, height) while chunks exist
+        self._refresh_pending = False
+        self._width = 1
+
+    def __len__(self):
+        return len(self.messages)
+
+    def _top(self):
+        return self._header[2] if self._header else 0
+
+    def append(self, message):
+        """Add a message at the end and return it."""
+        message["seq"] = self._next_seq
+        self._next_seq += 1
+        self.messages.append(message)
+        self._heights.append(self.estimate(message))
+        if len(self.messages) > self.retention + max(1, self.retention // 4):
+            self._page_out(len(self.messages) - self.retention)
+        self._update_scrollregion()
+        return message
+
+    def update(self, message, **changes):
+        """Change a message in place and rebuild its widget if it is visible."""
+        message.update(changes)
+        index = message["seq"] - self._first_seq
+        if not 0 <= index < len(self.messages) or self.messages[index] is not message:
+            return
+        if "height" in changes:
+            self._heights.set(index, changes["height"])
+        if index in self._realized:
+            self._unrealize(index)
+        self.schedule_refresh()
+
+    def clear(self):
+        for index in list(self._realized):
+            self._unrealize(index)
+        self.messages = []
+        self._heights = _HeightIndex()
+        self._first_seq = self._next_seq
+        self._chunks = []
+        if self._page_file is not None:
+            self._page_file.close()
+            self._page_file = None
+        self._set_header()
+        self._update_scrollregion()
+
+    def _page_out(self, count):
+        for index in list(self._realized):
+            self._unrealize(index)
+        chunk = [{k: v for k, v in m.items() if not k.startswith('_')} for m in self.messages[:count]]
+        if self._page_file is None:
+            self._page_file = tempfile.TemporaryFile(prefix="botx-transcript-")
+        self._page_file.seek(0, os.SEEK_END)
+        self._chunks.append(self._page_file.tell())
+        pickle.dump(chunk, self._page_file, pickle.HIGHEST_PROTOCOL)
+        self.messages = self.messages[count:]
+        self._heights = _HeightIndex(self._heights.heights[count:])
+        self._first_seq += count
+        self._set_header()
+
+    def load_earlier(self):
+        """Page the most recent chunk of older messages back in."""
+        if not self._chunks:
+            return
+        for index in list(self._realized):
+            self._unrealize(index)
+        start = self._chunks.pop()
+        self._page_file.seek(start)
+        chunk = pickle.load(self._page_file)
+        self._page_file.truncate(start)
+        self.messages = chunk + self.messages
+        self._heights = _HeightIndex([self.estimate(m) for m in chunk] + self._heights.heights)
+        self._first_seq -= len(chunk)
+        self._set_header()
+        self._update_scrollregion()
+        self.canvas.yview_moveto(0.0)
+        self.schedule_refresh()
+
+    def _set_header(self):
+        if self._chunks and self._header is None:
+            frame = self.build_header(self.canvas)
+            frame.update_idletasks()
+            item = self.canvas.create_window(0, 0, window=frame, anchor="nw", width=self._width)
+            self._header = (frame, item, frame.winfo_reqheight())
+        elif not self._chunks and self._header is not None:
+            frame, item, _ = self._header
+            self.canvas.delete(item)
+            frame.destroy()
+            self._header = None
+
+    def _update_scrollregion(self):
+        height = self._top() + self._heights.total()
+        self.canvas.configure(scrollregion=(0, 0, self._width, height))
+
+    def _unrealize(self, index):
+        frame, item = self._realized.pop(index)
+        self.canvas.delete(item)
+        kind = frame.botx_kind
+        if kind in self.recyclable and len(self._pool[kind]) < 32:
+            self._pool[kind].append(frame)
+        else:
+            frame.destroy()
+
+    def _realize(self, index, y):
+        message = self.messages[index]
+        kind = message["kind"]
+        reuse = self._pool[kind].pop() if self._pool[kind] else None
+        with tracer.span("tk.layout", kind=kind):
+            frame = self.build(self.canvas, message, reuse)
+            frame.botx_kind = kind
+            item = self.canvas.create_window(0, y, window=frame, anchor="nw", width=self._width)
+            self._realized[index] = (frame, item)
+            frame.update_idletasks()
+        height = frame.winfo_reqheight()
+        if height != self._heights.heights[index]:
+            self._heights.set(index, height)
+            return True
+        return False
+
+    def schedule_refresh(self):
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.canvas.after_idle(self.refresh)
+
+    def refresh(self):
+        """Realize the messages near the viewport and drop the rest."""
+        self._refresh_pending = False
+        top = self._top()
+        view_top = self.canvas.canvasy(0) - self.overscan - top
+        view_bottom = self.canvas.canvasy(self.canvas.winfo_height()) + self.overscan - top
+        first = self._heights.find(max(view_top, 0))
+        wanted = set()
+        index, y = first, self._heights.offset(first)
+        while index < len(self.messages) and y < view_bottom:
+            if self.messages[index]["kind"] != "hidden":
+                wanted.add(index)
+            y += self._heights.heights[index]
+            index += 1
+        for index in list(self._realized):
+            if index not in wanted:
+                self._unrealize(index)
+        resized = False
+        for index in sorted(wanted):
+            if index not in self._realized:
+                resized |= self._realize(index, top + self._heights.offset(index))
+        if resized:
+            for index, (frame, item) in self._realized.items():
+                self.canvas.coords(item, 0, top + self._heights.offset(index))
+            self._update_scrollregion()
+
+    def scroll_to_end(self):
+        self.canvas.yview_moveto(1.0)
+        self.refresh()
+        self.canvas.yview_moveto(1.0)
+
+    def resize(self, width):
+        """Match message widths to the canvas width."""
+        self._width = width
+        if self._header:
+            self.canvas.itemconfig(self._header[1], width=width)
+        for frame, item in self._realized.values():
+            self.canvas.itemconfig(item, width=width)
+        self._update_scrollregion()
+        self.schedule_refresh()
 
 # --- Modern Chatbot GUI with LaTeX and Plotting (Fixed Scrolling) ---
+PLACEHOLDER = "Enter equation (e.g., x^2 = 4)"
+PREVIEW_DELAY_MS = 150      # typing pause before the input is parsed and previewed
+SPECULATIVE_DELAY_MS = 600  # typing pause before a background solve starts
+
 class ModernBotXGUI:
     def __init__(self, root):
         self.root = root
@@ -100,7 +3402,20 @@ class ModernBotXGUI:
         # Initialize attributes early
         self.message_count = 0
         self.last_equation = None
+        self.session_id = None  # SessionLog session, started with the first solved equation
         self.numerical_var = tk.BooleanVar(value=False)  # New toggle for numerical mode
+        self.digits_var = tk.StringVar(value=str(DISPLAY_DIGITS))  # significant digits in numerical mode
+        self.active_jobs = {}  # job_id -> details of solves still running
+        self.solver_engine = None  # started by start_services() once the window is up
+        self.plot_windows = {}  # expression -> open plot window
+        self.latex_renderer = LatexRenderer(cache_dir=os.path.join(CACHE_DIR, "latex"))
+        self.latex_photos = collections.OrderedDict()  # LaTeX string -> PhotoImage (LRU)
+        self.render_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.render_results = queue.Queue()
+        self.speculative = None  # background solve started while typing: key and job id
+        self.preview_latex = None
+        self._preview_id = None
+        self._speculate_id = None
         
         # Configure styles
         self.style = ttk.Style()
@@ -133,18 +3448,19 @@ class ModernBotXGUI:
         chat_container.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
         # Chat display with gradient background
-        self.chat_canvas = Canvas(chat_container, bg='#34495e', highlightthickness=0)
+        self.chat_canvas = tk.Canvas(chat_container, bg='#34495e', highlightthickness=0)
         self.chat_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # Create scrollbar for chat - PROPERLY SIZED AND PLACED
         self.scrollbar = ttk.Scrollbar(chat_container, orient=tk.VERTICAL, command=self.chat_canvas.yview)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        self.chat_canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.chat_canvas.configure(yscrollcommand=self.on_chat_scroll)
         
-        # Create frame inside canvas for messages
-        self.chat_inner_frame = ttk.Frame(self.chat_canvas, style='TFrame')
-        self.chat_window = self.chat_canvas.create_window((0, 0), window=self.chat_inner_frame, anchor="nw")
+        # Only messages near the viewport exist as widgets
+        self.transcript = ChatTranscript(self.chat_canvas, self.build_message,
+                                         self.build_transcript_header, self.estimate_message_height,
+                                         recyclable=("text",))
         
         # Input area - SEPARATED FROM CHAT AREA
         input_frame = ttk.Frame(main_frame)
@@ -160,6 +3476,7 @@ class ModernBotXGUI:
                                   values=["real", "complex", "imaginary"],
                                   state="readonly", width=12)
         domain_combo.pack()
+        domain_combo.bind("<<ComboboxSelected>>", self.on_input_changed)
         
         # Numerical mode toggle
         mode_frame = ttk.Frame(input_frame)
@@ -168,13 +3485,21 @@ class ModernBotXGUI:
                                         variable=self.numerical_var,
                                         command=self.on_mode_toggle)
         self.mode_check.pack()
+        digits_frame = ttk.Frame(mode_frame)
+        digits_frame.pack()
+        ttk.Label(digits_frame, text="Digits:").pack(side=tk.LEFT)
+        digits_box = ttk.Spinbox(digits_frame, from_=1, to=PRECISION_MAX_DPS, width=5,
+                                 textvariable=self.digits_var, command=self.on_input_changed)
+        digits_box.pack(side=tk.LEFT)
+        digits_box.bind("<KeyRelease>", self.on_input_changed)
         
         # Equation input
         self.input_entry = ttk.Entry(input_frame, font=('Arial', 12), width=50)
         self.input_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
-        self.input_entry.insert(0, "Enter equation (e.g., x^2 = 4)")
+        self.input_entry.insert(0, PLACEHOLDER)
         self.input_entry.bind("<FocusIn>", self.clear_placeholder)
         self.input_entry.bind("<Return>", self.send_message)
+        self.input_entry.bind("<KeyRelease>", self.on_input_changed)
         
         # Action buttons
         button_frame = ttk.Frame(input_frame)
@@ -187,19 +3512,34 @@ class ModernBotXGUI:
         self.plot_btn.pack(side=tk.LEFT, padx=(0, 5))
         
         self.clear_btn = ttk.Button(button_frame, text="Clear", command=self.clear_chat)
-        self.clear_btn.pack(side=tk.LEFT)
+        self.clear_btn.pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.history_btn = ttk.Button(button_frame, text="🕘 History", command=self.open_history)
+        self.history_btn.pack(side=tk.LEFT)
+        
+        # Live preview of the equation being typed (or its syntax error)
+        preview_frame = tk.Frame(main_frame, bg='#ecf0f1')
+        preview_frame.pack(fill=tk.X, pady=(0, 5))
+        self.preview_label = tk.Label(preview_frame, bg='#ecf0f1', anchor=tk.W, font=('Arial', 10))
+        self.preview_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.preview_status = tk.Label(preview_frame, bg='#ecf0f1', fg='#27ae60', font=('Arial', 10))
+        self.preview_status.pack(side=tk.RIGHT, padx=5)
         
-        # Status bar
+        # Status bar, with a toggle for the performance panel
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.status_var = tk.StringVar(value="Ready | Domain: real | Mode: Symbolic")
-        status_bar = ttk.Label(main_frame, textvariable=self.status_var, 
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, 
                               relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.perf_btn = ttk.Button(status_frame, text="📊 Stats", command=self.toggle_perf_panel)
+        self.perf_btn.pack(side=tk.RIGHT)
+        self.build_perf_panel(main_frame)
         
         # Welcome message
         self.add_bot_message("Hello! I'm botX, your AI math assistant. I can solve equations, plot functions, and explain mathematical concepts. Try entering an equation like 'x^2 = 4' or 'sin(x) = 0.5'! Toggle 'Numerical Mode' for approximate solutions.")
         
         # Bind events for scrolling
-        self.chat_inner_frame.bind("<Configure>", self.on_frame_configure)
         self.chat_canvas.bind("<Configure>", self.on_canvas_configure)
         
         # Mousewheel support
@@ -221,25 +3561,128 @@ class ModernBotXGUI:
         # Make sure chat area gets focus when clicked
         self.chat_canvas.bind("<Button-1>", lambda e: self.chat_canvas.focus_set())
         
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def start_services(self):
+        """Start the solver pool and warm up SymPy after the window has painted."""
+        if self.solver_engine is not None:
+            return
+        self.solver_engine = SolverJobEngine()
+        self.warmup_thread = threading.Thread(target=warm_solver, daemon=True)
+        self.warmup_thread.start()
+        # Collect background solver results without blocking the Tk loop
+        self.root.after(SOLVER_POLL_MS, self.poll_solver)
+        
+    def on_close(self):
+        """Stop background solvers before closing the window."""
+        if self.solver_engine is not None:
+            self.solver_engine.shutdown()
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
     def on_mode_toggle(self):
         """Update status when mode is toggled."""
         self.update_status()
+        self.on_input_changed()
         if self.numerical_var.get():
             self.add_bot_message("Switched to Numerical Mode: Solutions will be approximate values.")
         else:
             self.add_bot_message("Switched to Symbolic Mode: Solutions will be exact/simplified.")
     
+    def on_input_changed(self, event=None):
+        """Debounce typing: preview after a short pause, solve after a longer one."""
+        if event is not None and getattr(event, "keysym", None) == "Return":
+            return
+        for after_id in (self._preview_id, self._speculate_id):
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+        self._speculate_id = None
+        self._preview_id = self.root.after(PREVIEW_DELAY_MS, self.preview_input)
+    
+    def current_digits(self):
+        """Significant digits for numerical answers, or None in symbolic mode."""
+        if not self.numerical_var.get():
+            return None
+        try:
+            return min(max(int(self.digits_var.get()), 1), PRECISION_MAX_DPS)
+        except ValueError:
+            return DISPLAY_DIGITS
+    
+    def current_key(self):
+        """(normalized input, domain, numerical, digits) for the entry, or None if it is empty."""
+        text = self.input_entry.get().strip()
+        if not text or text == PLACEHOLDER:
+            return None
+        return normalize_input(text), self.domain_var.get(), self.numerical_var.get(), self.current_digits()
+    
+    def preview_input(self):
+        """Parse the entry, show its LaTeX (or the syntax error) and schedule a speculative solve."""
+        self._preview_id = None
+        key = self.current_key()
+        if self.speculative is not None and self.speculative["key"] != key:
+            self.cancel_speculative()
+        self.preview_status.config(text="")
+        if key is None or key[0].lower() == 'quit':
+            self.preview_latex = None
+            self.preview_label.config(image="", text="")
+            return
+        try:
+            with tracer.span("preview.parse"):
+                equations = parse_system(key[0])
+            if not equations:
+                raise ValueError("empty equation")
+        except Exception as e:
+            self.preview_latex = None
+            self.preview_label.config(image="", fg='#c0392b', text=f"⚠️ {syntax_error_message(e)}")
+            return
+        
+        latex = r",\quad ".join(sp.latex(eq) for eq in equations)
+        self.preview_latex = latex
+        self.preview_label.config(image="", fg='#2c3e50', text=latex)  # until the render is ready
+        self.render_latex_async(latex, lambda photo: self.set_preview_image(latex, photo))
+        self._speculate_id = self.root.after(SPECULATIVE_DELAY_MS - PREVIEW_DELAY_MS, self.speculate)
+    
+    def set_preview_image(self, latex, photo):
+        if latex == self.preview_latex and photo is not None:
+            self.preview_label.config(image=photo, text="")
+            self.preview_label.image = photo
+    
+    def speculate(self):
+        """Start solving the entry in the background before the user presses Enter."""
+        self._speculate_id = None
+        key = self.current_key()
+        if key is None or solution_cache().lookup(*key) is not None:
+            return
+        if self.speculative is not None:
+            if self.speculative["key"] == key:
+                return
+            self.cancel_speculative()
+        if any((job["input"], job["domain"], job["numerical"], job["digits"]) == key
+               for job in self.active_jobs.values()):
+            return
+        text, domain, numerical, digits = key
+        job_id = self.solver_engine.submit(solve_details, text, domain, numerical, True, None, digits)
+        self.speculative = {"key": key, "job_id": job_id}
+        tracer.count("speculative.started")
+    
+    def cancel_speculative(self):
+        """Drop a speculative solve whose input has changed (a running one restarts its worker)."""
+        self.solver_engine.cancel(self.speculative["job_id"])
+        self.speculative = None
+        tracer.count("speculative.cancelled")
+    
     def clear_placeholder(self, event):
-        if self.input_entry.get() == "Enter equation (e.g., x^2 = 4)":
+        if self.input_entry.get() == PLACEHOLDER:
             self.input_entry.delete(0, tk.END)
     
-    def on_frame_configure(self, event):
-        """Update scrollregion when inner frame changes size."""
-        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
+    def on_chat_scroll(self, first, last):
+        """Keep the scrollbar in sync and realize messages scrolled into view."""
+        self.scrollbar.set(first, last)
+        self.transcript.schedule_refresh()
     
     def on_canvas_configure(self, event):
-        """Update canvas window width when canvas resizes."""
-        self.chat_canvas.itemconfig(self.chat_window, width=event.width)
+        """Update message widths when canvas resizes."""
+        self.transcript.resize(event.width)
     
     def on_mousewheel(self, event):
         """Handle mousewheel scrolling."""
@@ -257,8 +3700,41 @@ class ModernBotXGUI:
     
     def add_message(self, sender, message, is_bot=True):
         """Add a message to the chat with appropriate styling."""
-        message_frame = ttk.Frame(self.chat_inner_frame)
-        message_frame.pack(fill=tk.X, pady=5)
+        self.transcript.append({"kind": "text", "sender": sender, "text": message, "is_bot": is_bot})
+        self.message_count += 1
+        self.update_status()
+        self.transcript.scroll_to_end()
+    
+    def estimate_message_height(self, message):
+        """Rough pixel height of a message before it has been measured."""
+        kind = message["kind"]
+        if kind == "text":
+            lines = sum(max(1, -(-len(line) // 70)) for line in message["text"].split("\n"))
+            return 22 * lines + 36
+        return {"solution": 110, "pending": 44, "plot": 40, "history": 40}.get(kind, 0)
+    
+    def build_message(self, parent, message, reuse=None):
+        """Create (or refill a recycled) widget for a transcript message."""
+        kind = message["kind"]
+        if kind == "solution":
+            return self.build_solution_message(parent, message)
+        if kind == "pending":
+            return self.build_pending_message(parent, message)
+        if kind == "plot":
+            return self.build_plot_prompt(parent, message)
+        if kind == "history":
+            return self.build_history_footer(parent, message)
+        
+        # Different colors for bot and user
+        is_bot = message["is_bot"]
+        bg_color = '#3498db' if is_bot else '#95a5a6'
+        text_color = 'white' if is_bot else 'black'
+        if reuse is not None:
+            reuse.avatar.configure(text="🤖" if is_bot else "👤")
+            reuse.label.configure(text=message["text"], background=bg_color, foreground=text_color)
+            return reuse
+        
+        message_frame = ttk.Frame(parent, padding=(0, 5))
         
         # Avatar
         avatar_text = "🤖" if is_bot else "👤"
@@ -273,25 +3749,22 @@ class ModernBotXGUI:
         bubble = ttk.Frame(bubble_frame)
         bubble.pack(fill=tk.X, expand=True)
         
-        # Different colors for bot and user
-        bg_color = '#3498db' if is_bot else '#95a5a6'
-        text_color = 'white' if is_bot else 'black'
-        
-        message_label = ttk.Label(bubble, text=message, wraplength=600, justify=tk.LEFT,
+        message_label = ttk.Label(bubble, text=message["text"], wraplength=600, justify=tk.LEFT,
                                 background=bg_color, foreground=text_color,
                                 font=('Arial', 11), padding=10,
                                 borderwidth=2, relief='raised')
         message_label.pack(fill=tk.X, expand=True)
         
-        if not hasattr(self, 'message_count'):
-            self.message_count = 0
-        self.message_count += 1
-        self.update_status()
-        
-        # Update scroll region and scroll to bottom
-        self.chat_canvas.update_idletasks()
-        self.on_frame_configure(None)
-        self.chat_canvas.yview_moveto(1.0)
+        message_frame.avatar = avatar
+        message_frame.label = message_label
+        return message_frame
+    
+    def build_transcript_header(self, parent):
+        """Header offering to page older messages back in."""
+        frame = ttk.Frame(parent, padding=(0, 5))
+        ttk.Button(frame, text="Load earlier messages",
+                   command=self.transcript.load_earlier).pack()
+        return frame
     
     def add_bot_message(self, message):
         self.add_message("botX", message, True)
@@ -299,26 +3772,43 @@ class ModernBotXGUI:
     def add_user_message(self, message):
         self.add_message("You", message, False)
     
-    def render_latex(self, latex_str):
-        """Render LaTeX string to image"""
-        try:
-            fig = Figure(figsize=(6, 2), dpi=100)
-            ax = fig.add_subplot(111)
-            ax.text(0.5, 0.5, f"${latex_str}$", fontsize=16, ha='center', va='center')
-            ax.axis('off')
-            
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0.1)
-            buf.seek(0)
-            
-            image = Image.open(buf)
-            photo = ImageTk.PhotoImage(image)
-            
-            return photo
-        except:
-            return None
+    def photo_image(self, latex_str, image):
+        """Wrap a rendered (width, height, rgba) buffer in a cached PhotoImage."""
+        photo = self.latex_photos.get(latex_str)
+        if photo is None:
+            width, height, data = image
+            photo = ImageTk.PhotoImage(Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", 0, 1))
+            self.latex_photos[latex_str] = photo
+            # Visible bubbles hold their own reference, so old entries can go
+            while len(self.latex_photos) > 64:
+                self.latex_photos.popitem(last=False)
+        else:
+            self.latex_photos.move_to_end(latex_str)
+        return photo
+    
+    def render_latex_async(self, latex_str, callback):
+        """Render in a background thread and call callback(photo or None) on the Tk thread."""
+        image = self.latex_renderer.cached(latex_str)
+        if image is not None:
+            callback(self.photo_image(latex_str, image))
+            return
+        future = self.render_executor.submit(self.latex_renderer.render, latex_str)
+        future.add_done_callback(lambda f: self.render_results.put((latex_str, f, callback)))
+    
+    def poll_renders(self):
+        """Hand finished LaTeX renders to their callbacks."""
+        while True:
+            try:
+                latex_str, future, callback = self.render_results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                photo = self.photo_image(latex_str, future.result())
+            except Exception:
+                photo = None
+            callback(photo)
     
-    def format_solution(self, solutions, domain, numerical=False):
+    def format_solution(self, solutions, domain, numerical=False, digits=DISPLAY_DIGITS):
         """Format solutions with LaTeX rendering or numerical display"""
         if solutions == sp.EmptySet:
             return "No solutions found in the specified domain."
@@ -326,7 +3816,17 @@ class ModernBotXGUI:
         if numerical:
             # Format numerical solutions
             try:
-                nums = [str(s.evalf(6)) for s in solutions]
+                if isinstance(solutions, sp.ConditionSet) or (
+                        isinstance(solutions, sp.Union) and any(isinstance(a, sp.ConditionSet) for a in solutions.args)):
+                    # certified-partial: verified roots plus intervals that could not be decided
+                    parts = solutions.args if isinstance(solutions, sp.Union) else (solutions,)
+                    nums = [str(s.evalf(digits)) for p in parts if isinstance(p, sp.FiniteSet) for s in p]
+                    nums += [self.format_region(p.base_set, digits) for p in parts if isinstance(p, sp.ConditionSet)]
+                    return ", ".join(nums)
+                if solutions and isinstance(next(iter(solutions)), sp.Tuple):
+                    nums = ["(" + ", ".join(str(v.evalf(digits)) for v in t) + ")" for t in solutions]
+                else:
+                    nums = [str(s.evalf(digits)) for s in solutions]
                 return ", ".join(nums)
             except:
                 return str(solutions)
@@ -338,93 +3838,195 @@ class ModernBotXGUI:
             except:
                 return str(solutions)
     
-    def plot_equation(self):
-        """Plot the equation if it's plottable"""
-        if self.last_equation is None:
+    @staticmethod
+    def format_region(region, digits=DISPLAY_DIGITS):
+        """Where an unresolved root may lie: an interval, or a rectangle of the complex plane."""
+        if isinstance(region, sp.ComplexRegion):
+            re, im = region.a_interval, region.b_interval
+            return (f"possible root with real part in [{re.inf.evalf(digits)}, {re.sup.evalf(digits)}] "
+                    f"and imaginary part in [{im.inf.evalf(digits)}, {im.sup.evalf(digits)}]")
+        return f"possible root in [{region.inf.evalf(digits)}, {region.sup.evalf(digits)}]"
+    
+    def plot_equation(self, equation=None, domain=None):
+        """Plot the equation (by default the last one solved) if it's plottable"""
+        if equation is None:
+            equation = self.last_equation
+        if equation is None:
             self.add_bot_message("Please solve an equation first before plotting.")
             return
         
         try:
-            equation = self.last_equation
-            x = sp.symbols('x')
+            if not is_plottable(equation):
+                self.add_bot_message("Plotting is only supported for a single equation in one variable.")
+                return
+            x = equation_symbols(equation)[0]
             
-            if self.domain_var.get() != "real":
+            if (domain or self.domain_var.get()) != "real":
                 self.add_bot_message("Plotting is only supported in the 'real' domain.")
                 return
             
-            plot_window = tk.Toplevel(self.root)
-            plot_window.title("Equation Plot")
-            plot_window.geometry("800x600")
-            
-            fig = Figure(figsize=(8, 6), dpi=100)
-            ax = fig.add_subplot(111)
-            
             if equation.rhs == 0:
                 expr = equation.lhs
             else:
                 expr = equation.lhs - equation.rhs
             
+            # Re-use the window if this equation is already plotted
+            window = self.plot_windows.get(expr)
+            if window is not None and window.winfo_exists():
+                window.deiconify()
+                window.lift()
+                return
+            
             try:
-                f = sp.lambdify(x, expr, 'numpy')
+                f = plot_function(expr, x)
             except Exception as e:
                 self.add_bot_message(f"Could not create plottable function: {str(e)}")
-                plot_window.destroy()
                 return
             
-            x_vals = np.linspace(-10, 10, 400)
             try:
-                y_vals = f(x_vals)
-                mask = np.isfinite(y_vals)
-                x_vals = x_vals[mask]
-                y_vals = y_vals[mask]
+                x_vals, y_vals, breaks = adaptive_sample(f, *PLOT_RANGE)
             except Exception as e:
                 self.add_bot_message(f"Error evaluating function: {str(e)}")
-                plot_window.destroy()
                 return
             
-            if len(x_vals) == 0:
+            if not np.isfinite(y_vals).any():
                 self.add_bot_message("No valid points to plot (function may be undefined).")
-                plot_window.destroy()
                 return
             
-            ax.plot(x_vals, y_vals, 'b-', linewidth=2, label=f'y = {sp.latex(expr)}')
+            plot_window = tk.Toplevel(self.root)
+            plot_window.title("Equation Plot")
+            plot_window.geometry("800x600")
+            self.plot_windows[expr] = plot_window
+            
+            fig = mpl_figure.Figure(figsize=(8, 6), dpi=100)
+            ax = fig.add_subplot(111)
+            
+            line, = ax.plot(x_vals, y_vals, 'b-', linewidth=2, label=f'y = {sp.latex(expr)}')
             ax.axhline(y=0, color='k', linestyle='-', alpha=0.3)
             ax.axvline(x=0, color='k', linestyle='-', alpha=0.3)
             ax.grid(True, alpha=0.3)
-            ax.set_xlabel('x')
-            ax.set_ylabel('f(x)')
+            ax.set_xlabel(f'${sp.latex(x)}$')
+            ax.set_ylabel(f'$f({sp.latex(x)})$')
             ax.set_title(f'Plot of ${sp.latex(expr)}$')
             ax.legend()
+            ax.set_xlim(*PLOT_RANGE)
+            if breaks:
+                # Keep poles from stretching the y-axis to huge values
+                lo, hi = np.nanpercentile(y_vals, [5, 95])
+                pad = max(hi - lo, 1.0) * 0.5
+                ax.set_ylim(lo - pad, hi + pad)
             
-            canvas = FigureCanvasTkAgg(fig, plot_window)
+            canvas = backend_tkagg.FigureCanvasTkAgg(fig, plot_window)
+            toolbar = backend_tkagg.NavigationToolbar2Tk(canvas, plot_window)
+            toolbar.update()
             canvas.draw()
             canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
             
+            # Re-sample only the visible range after a pan or zoom
+            pending = {}
+            def resample():
+                pending.clear()
+                a, b = ax.get_xlim()
+                xs, ys, _ = adaptive_sample(f, a, b)
+                line.set_data(xs, ys)
+                canvas.draw_idle()
+            def on_xlim_changed(axes):
+                if not pending:
+                    pending["id"] = plot_window.after(60, resample)
+            ax.callbacks.connect('xlim_changed', on_xlim_changed)
+            
             self.add_bot_message("I've created a plot of your equation in a new window!")
             
         except Exception as e:
             self.add_bot_message(f"Could not plot the equation: {str(e)}")
     
+    def build_perf_panel(self, parent):
+        """Collapsible panel with per-stage timings and counters (hidden until toggled)."""
+        self.perf_frame = ttk.Frame(parent, padding=(0, 5))
+        self.perf_text = tk.Text(self.perf_frame, height=12, font=('Courier', 10), bg='#ecf0f1',
+                                 relief=tk.FLAT, state="disabled")
+        self.perf_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        buttons = ttk.Frame(self.perf_frame)
+        buttons.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
+        ttk.Button(buttons, text="Export trace…", command=self.export_trace).pack(fill=tk.X, pady=(0, 5))
+        ttk.Button(buttons, text="Reset", command=self.reset_perf_stats).pack(fill=tk.X, pady=(0, 5))
+        self.profile_next_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(buttons, text="Profile next solve", variable=self.profile_next_var).pack(fill=tk.X)
+        self.last_profile = None
+        self._perf_refresh_id = None
+        self.trace_by_default = tracer.enabled  # BOTX_TRACE=1 keeps tracing on
+    
+    def toggle_perf_panel(self):
+        """Show or hide the stats panel; tracing is on while it is shown."""
+        if self.perf_frame.winfo_manager():
+            self.perf_frame.pack_forget()
+            tracer.enabled = self.trace_by_default
+        else:
+            self.perf_frame.pack(side=tk.BOTTOM, fill=tk.X)
+            tracer.enabled = True
+            self.refresh_perf_panel()
+    
+    def refresh_perf_panel(self):
+        """Redraw the stats panel now, then every half second while it is shown."""
+        if self._perf_refresh_id is not None:
+            self.root.after_cancel(self._perf_refresh_id)
+            self._perf_refresh_id = None
+        if not self.perf_frame.winfo_manager():
+            return
+        stages, counters = tracer.summary()
+        lines = [f"{'stage':<28}{'count':>7}{'total ms':>11}{'max ms':>10}"]
+        lines += [f"{name:<28}{count:>7}{total:>11.2f}{longest:>10.2f}" for name, count, total, longest in stages]
+        if counters:
+            lines.append("")
+            lines += [f"{name:<28}{value:>7}" for name, value in sorted(counters.items())]
+        if len(lines) == 1:
+            lines.append("No data yet: solve an equation while this panel is open.")
+        if self.last_profile:
+            lines += ["", self.last_profile]
+        self.perf_text.config(state="normal")
+        self.perf_text.delete("1.0", tk.END)
+        self.perf_text.insert("1.0", "\n".join(lines))
+        self.perf_text.config(state="disabled")
+        self._perf_refresh_id = self.root.after(500, self.refresh_perf_panel)
+    
+    def reset_perf_stats(self):
+        tracer.reset()
+        self.last_profile = None
+    
+    def export_trace(self):
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".json",
+                                            initialfile="botx-trace.json",
+                                            filetypes=[("Chrome trace", "*.json")])
+        if path:
+            tracer.export_chrome(path)
+            self.add_bot_message(f"📊 Trace saved to {path}. Open it in chrome://tracing or ui.perfetto.dev.")
+    
     def update_status(self):
         mode_text = "Numerical" if self.numerical_var.get() else "Symbolic"
-        self.status_var.set(f"Messages: {self.message_count} | Domain: {self.domain_var.get()} | Mode: {mode_text}")
+        status = f"Messages: {self.message_count} | Domain: {self.domain_var.get()} | Mode: {mode_text}"
+        if getattr(self, 'active_jobs', None):
+            status += f" | Solving: {len(self.active_jobs)}"
+        self.status_var.set(status)
     
     def clear_chat(self):
-        for widget in self.chat_inner_frame.winfo_children():
-            widget.destroy()
+        for job_id in self.active_jobs:
+            self.solver_engine.cancel(job_id)
+        self.active_jobs.clear()
+        self.transcript.clear()
         self.message_count = 0
         self.last_equation = None
+        self.session_id = None  # the next equation starts a new session
         self.plot_btn.config(state="disabled")
         self.update_status()
-        self.on_frame_configure(None)
-        self.add_bot_message("Chat cleared. Ready to solve more equations!")
+        self.add_bot_message("Chat cleared. Ready to solve more equations! Earlier sessions are still in 🕘 History.")
     
     def send_message(self, event=None):
         user_input = self.input_entry.get().strip()
-        if not user_input or user_input == "Enter equation (e.g., x^2 = 4)":
+        if not user_input or user_input == PLACEHOLDER:
             return
         
-        user_input = user_input.replace('^', '**').replace('ln','log')
+        user_input = normalize_input(user_input)
         self.add_user_message(user_input)
         self.input_entry.delete(0, tk.END)
         
@@ -432,76 +4034,545 @@ class ModernBotXGUI:
             self.root.quit()
             return
         
+        numerical = self.numerical_var.get()
+        domain = self.domain_var.get()
+        digits = self.current_digits()
+        if numerical and domain != "real":
+            re_lo, re_hi, im_lo, im_hi = ROOT_BOX
+            self.add_bot_message(f"🔍 Searching for {domain} roots with real and imaginary parts in "
+                                 f"[{re_lo:g}, {re_hi:g}] x [{im_lo:g}, {im_hi:g}] (polynomials: all roots).")
+        
+        self.start_services()
+        self.on_input_changed()  # the entry is now empty: clear the preview
+        speculative, self.speculative = self.speculative, None
+        # Repeat queries (and finished speculative solves) are answered from the cache
+        cached = solution_cache().lookup(user_input, domain, numerical, digits)
+        if speculative is not None and (cached is not None
+                                        or speculative["key"] != (user_input, domain, numerical, digits)):
+            self.solver_engine.cancel(speculative["job_id"])
+            speculative = None
+        if cached is not None:
+            tracer.count("cache.hit.text")
+            self.show_solution(cached[0], cached[1], domain, numerical, user_input, cached[2], digits)
+            return
+        
+        profile_path = None
+        traced = tracer.enabled
+        if speculative is not None:
+            # Already solving in the background: wait for that job instead
+            job_id = speculative["job_id"]
+            traced = False
+            tracer.count("speculative.adopted")
+        elif traced:
+            # Worker processes trace only while the panel is open
+            if self.profile_next_var.get():
+                self.profile_next_var.set(False)
+                os.makedirs(os.path.join(CACHE_DIR, "profiles"), exist_ok=True)
+                profile_path = os.path.join(CACHE_DIR, "profiles", time.strftime("solve-%Y%m%d-%H%M%S.prof"))
+            job_id = self.solver_engine.submit(traced_call, profile_path, solve_details,
+                                               user_input, domain, numerical, True, None, digits)
+        else:
+            job_id = self.solver_engine.submit(solve_details, user_input, domain, numerical, True, None, digits)
+        self.active_jobs[job_id] = {
+            "input": user_input,
+            "domain": domain,
+            "numerical": numerical,
+            "digits": digits,
+            "message": self.add_pending_message(job_id, user_input),
+            "started": time.perf_counter(),
+            "traced": traced,
+            "profile_path": profile_path,
+        }
+        self.update_status()
+    
+    def add_pending_message(self, job_id, user_input):
+        """Show a "solving…" bubble with a cancel button for a running job."""
+        message = self.transcript.append({"kind": "pending", "job_id": job_id, "text": user_input})
+        self.transcript.scroll_to_end()
+        return message
+    
+    def build_pending_message(self, parent, message):
+        message_frame = ttk.Frame(parent, padding=(0, 5))
+        avatar = ttk.Label(message_frame, text="⏳", font=('Arial', 16),
+                         background='#34495e', foreground='white')
+        avatar.pack(side=tk.LEFT, padx=(10, 5))
+        
+        label = ttk.Label(message_frame, text=f"Solving {message['text']} …",
+                        background='#34495e', foreground='white', font=('Arial', 11))
+        label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        cancel_btn = ttk.Button(message_frame, text="Cancel",
+                              command=lambda: self.cancel_job(message["job_id"]))
+        cancel_btn.pack(side=tk.LEFT)
+        return message_frame
+    
+    def cancel_job(self, job_id):
+        if job_id in self.active_jobs:
+            self.solver_engine.cancel(job_id)
+    
+    def poll_solver(self):
+        """Hand finished background solves to the GUI, then reschedule."""
         try:
-            numerical = self.numerical_var.get()
-            if numerical and self.domain_var.get() != "real":
-                self.add_bot_message("⚠️ Numerical mode is best suited for real domain. Proceeding with approximations anyway.")
-            
-            solutions, equation = get_solution(user_input, self.domain_var.get(), numerical)
-            self.last_equation = equation
-            self.plot_btn.config(state="normal")
-            
-            formatted = self.format_solution(solutions, self.domain_var.get(), numerical)
-            latex_image = self.render_latex(formatted) if not numerical else None
-            
-            if latex_image and not numerical:
-                message_frame = ttk.Frame(self.chat_inner_frame)
-                message_frame.pack(fill=tk.X, pady=5)
-                avatar = ttk.Label(message_frame, text="🤖", font=('Arial', 16),
-                                 background='#34495e', foreground='white')
-                avatar.pack(side=tk.LEFT, padx=(10, 5))
-                
-                bubble_frame = ttk.Frame(message_frame)
-                bubble_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                
-                # LaTeX image label
-                latex_label = ttk.Label(bubble_frame, image=latex_image,
-                                      background='#3498db')
-                latex_label.image = latex_image
-                latex_label.pack(pady=10)
-                
-                # Add text explanation
-                explanation = "Here's the solution to your equation:"
-                if solutions == sp.EmptySet:
-                    explanation = "No solutions found in the specified domain."
-                
-                text_label = ttk.Label(bubble_frame, text=explanation,
-                                     background='#3498db', foreground='white',
-                                     font=('Arial', 11), padding=5)
-                text_label.pack(fill=tk.X)
-                
+            for job_id, status, payload in self.solver_engine.poll():
+                self.on_job_finished(job_id, status, payload)
+            self.poll_renders()
+        finally:
+            self.root.after(SOLVER_POLL_MS, self.poll_solver)
+    
+    def on_job_finished(self, job_id, status, payload):
+        if self.speculative is not None and job_id == self.speculative["job_id"]:
+            # Keep the answer for when Enter is pressed
+            if status == "ok":
+                text, domain, numerical, digits = self.speculative["key"]
+                solution_cache().remember(text, domain, numerical,
+                                          (payload["solutions"], payload["equation"], payload["method"]), digits)
+                self.preview_status.config(text="✓ solved, press Enter")
+            self.speculative = None
+            return
+        job = self.active_jobs.pop(job_id, None)
+        if job is None:
+            return
+        self.transcript.update(job["message"], kind="hidden", height=0)
+        self.update_status()
+        
+        if tracer.enabled:
+            tracer.record("gui.solve_roundtrip", job["started"], time.perf_counter(), {"status": status})
+        if status == "ok" and job["traced"]:
+            payload, trace, profile = payload
+            tracer.merge(trace)
+        if status == "ok" and job["profile_path"]:
+            self.last_profile = profile
+            self.add_bot_message(f"📈 Profile saved to {job['profile_path']}. The top functions are shown in the stats panel.")
+            self.refresh_perf_panel()
+        
+        if status == "ok":
+            solutions, equation = payload["solutions"], payload["equation"]
+            solution_cache().remember(job["input"], job["domain"], job["numerical"],
+                                      (solutions, equation, payload["method"]), job["digits"])
+            try:
+                self.show_solution(solutions, equation, job["domain"], job["numerical"],
+                                   job["input"], payload["method"], job["digits"])
+            except Exception as e:
+                self.add_bot_message(f"❌ Error solving equation: {str(e)}\nPlease check your input and try again.")
+        elif status == "timeout":
+            self.add_bot_message(f"⏱️ Solving took longer than {self.solver_engine.timeout:g} seconds and was stopped. Try Numerical Mode or a simpler form of the equation.")
+        elif status == "cancelled":
+            self.add_bot_message("Solving cancelled.")
+        else:
+            error_type, message = payload
+            if error_type == "SympifyError":
+                self.add_bot_message(f"❌ I couldn't understand that equation. Please use proper mathematical syntax.\nExample: x**2 = 4 or sin(x) = 0.5")
             else:
-                # For numerical or if LaTeX fails, use text message
-                if numerical:
-                    explanation = "Numerical solutions (approx. to 6 decimals):"
-                else:
-                    explanation = "Symbolic solution:"
-                if solutions == sp.EmptySet:
-                    explanation = "No solutions found in the specified domain."
-                
-                msg = f"{explanation}\n{formatted}"
-                self.add_bot_message(msg)
+                self.add_bot_message(f"❌ Error solving equation: {message}\nPlease check your input and try again.")
+    
+    def show_solution(self, solutions, equation, domain, numerical, user_input=None, method=None, digits=None):
+        """Display a solved equation in the chat, logging it to the session history."""
+        digits = digits or DISPLAY_DIGITS
+        self.last_equation = equation
+        self.plot_btn.config(state="normal" if is_plottable(equation) else "disabled")
+        
+        with tracer.span("format_solution"):
+            formatted = self.format_solution(solutions, domain, numerical, digits)
+        
+        if not numerical:
+            # Add text explanation
+            explanation = "Here's the solution to your equation:"
+            if isinstance(equation, tuple):
+                names = ", ".join(str(s) for s in equation_symbols(equation))
+                explanation = f"Here are the solutions for ({names}):"
+            if solutions == sp.EmptySet:
+                explanation = "No solutions found in the specified domain."
+            elif is_approximate(method):
+                explanation = "⏳ Exact solving hit its limit, so here are numerical solutions instead:"
+            self.transcript.append({"kind": "solution", "latex": formatted, "explanation": explanation})
+            image = self.latex_renderer.key(formatted)
+        else:
+            # For numerical or if LaTeX fails, use text message
+            explanation = f"Numerical solutions (to {digits} significant digits):"
+            if isinstance(equation, tuple):
+                names = ", ".join(str(s) for s in equation_symbols(equation))
+                explanation = f"Numerical solutions for ({names}) (approx. to {digits} significant digits):"
+            if solutions == sp.EmptySet:
+                explanation = "No solutions found in the specified domain."
             
-            # Plot suggestion for real domain
-            if self.domain_var.get() == "real" and solutions != sp.EmptySet and self.last_equation is not None:
-                plot_frame = ttk.Frame(self.chat_inner_frame)
-                plot_frame.pack(fill=tk.X, pady=5)
-                
-                plot_label = ttk.Label(plot_frame, text="Would you like to see a plot of this equation?",
-                                    background='#34495e', foreground='white')
-                plot_label.pack(side=tk.LEFT, padx=(10, 5))
-                
-                plot_btn = ttk.Button(plot_frame, text="Plot Equation", 
-                                    command=self.plot_equation)
-                plot_btn.pack(side=tk.LEFT)
-                
-        except sp.SympifyError as e:
-            self.add_bot_message(f"❌ I couldn't understand that equation. Please use proper mathematical syntax.\nExample: x**2 = 4 or sin(x) = 0.5")
+            msg = f"{explanation}\n{formatted}"
+            self.add_bot_message(msg)
+            image = None
+        
+        if user_input is not None:
+            if self.session_id is None:
+                self.session_id = session_log().start_session()
+            session_log().append(self.session_id, user_input, domain, numerical, equation, solutions,
+                                 method, explanation, formatted, image)
+        
+        # Plot suggestion for real domain
+        if domain == "real" and solutions != sp.EmptySet and is_plottable(equation):
+            self.transcript.append({"kind": "plot", "equation": equation})
+        
+        self.transcript.scroll_to_end()
+    
+    def build_solution_message(self, parent, message):
+        """Bubble with the rendered LaTeX, or the raw LaTeX until it is ready."""
+        message_frame = ttk.Frame(parent, padding=(0, 5))
+        avatar = ttk.Label(message_frame, text="🤖", font=('Arial', 16),
+                         background='#34495e', foreground='white')
+        avatar.pack(side=tk.LEFT, padx=(10, 5))
+        
+        bubble_frame = ttk.Frame(message_frame)
+        bubble_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        latex = message["latex"]
+        photo = None
+        if not message.get("render_failed"):
+            image = self.latex_renderer.cached(latex)
+            if image is not None:
+                photo = self.photo_image(latex, image)
+            elif not message.get("_rendering"):
+                message["_rendering"] = True
+                self.render_latex_async(latex, lambda photo: self.on_latex_rendered(message, photo))
+        
+        # LaTeX image label
+        if photo is not None:
+            latex_label = ttk.Label(bubble_frame, image=photo, background='#3498db')
+            latex_label.image = photo
+        else:
+            latex_label = ttk.Label(bubble_frame, text=latex,
+                                  background='#3498db', foreground='white',
+                                  font=('Arial', 11), padding=5)
+        latex_label.pack(pady=10)
+        
+        explanation = message["explanation"]
+        if message.get("render_failed") and explanation.startswith("Here's"):
+            explanation = "Symbolic solution:"
+        text_label = ttk.Label(bubble_frame, text=explanation,
+                             background='#3498db', foreground='white',
+                             font=('Arial', 11), padding=5)
+        text_label.pack(fill=tk.X)
+        return message_frame
+    
+    def on_latex_rendered(self, message, photo):
+        message.pop("_rendering", None)
+        if photo is None:
+            self.transcript.update(message, render_failed=True)
+        else:
+            self.transcript.update(message)
+    
+    def build_plot_prompt(self, parent, message):
+        plot_frame = ttk.Frame(parent, padding=(0, 5))
+        
+        plot_label = ttk.Label(plot_frame, text="Would you like to see a plot of this equation?",
+                            background='#34495e', foreground='white')
+        plot_label.pack(side=tk.LEFT, padx=(10, 5))
+        
+        plot_btn = ttk.Button(plot_frame, text="Plot Equation", 
+                            command=lambda: self.plot_equation(message["equation"]))
+        plot_btn.pack(side=tk.LEFT)
+        return plot_frame
+    
+    def open_history(self):
+        """Window for searching past equations and reopening sessions."""
+        window = getattr(self, "history_window", None)
+        if window is not None and window.winfo_exists():
+            window.deiconify()
+            window.lift()
+            return
+        window = self.history_window = tk.Toplevel(self.root)
+        window.title("botX History")
+        window.geometry("760x480")
+        window.configure(bg='#2c3e50')
+        
+        search_frame = ttk.Frame(window, padding=10)
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=(0, 5))
+        self.history_query = ttk.Entry(search_frame, font=('Arial', 12))
+        self.history_query.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.history_query.bind("<KeyRelease>", self.on_history_query)
+        
+        list_frame = ttk.Frame(window, padding=(10, 0))
+        list_frame.pack(fill=tk.BOTH, expand=True)
+        self.history_list = tk.Listbox(list_frame, font=('Courier', 10), bg='#ecf0f1',
+                                       activestyle='none', selectmode=tk.SINGLE)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.history_list.yview)
+        self.history_list.configure(yscrollcommand=scrollbar.set)
+        self.history_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_list.bind("<Double-Button-1>", lambda e: self.open_history_item())
+        self.history_list.bind("<Return>", lambda e: self.open_history_item())
+        
+        buttons = ttk.Frame(window, padding=10)
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="Open", command=self.open_history_item).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="Plot", command=lambda: self.open_history_item("plot")).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="Re-solve", command=lambda: self.open_history_item("resolve")).pack(side=tk.LEFT)
+        self.history_hint = ttk.Label(buttons, text="")
+        self.history_hint.pack(side=tk.RIGHT)
+        self._history_query_id = None
+        self.show_history()
+        self.history_query.focus_set()
+    
+    def on_history_query(self, event=None):
+        if self._history_query_id is not None:
+            self.root.after_cancel(self._history_query_id)
+        self._history_query_id = self.root.after(PREVIEW_DELAY_MS, self.show_history)
+    
+    def show_history(self):
+        """List recent sessions, or the entries matching the search text."""
+        self._history_query_id = None
+        query = self.history_query.get().strip()
+        start = time.perf_counter()
+        self.history_list.delete(0, tk.END)
+        if query:
+            self.history_items = [("entry", row) for row in session_log().search(query)]
+            lines = [f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))}  {row['input']}"
+                     f"  [{row['domain']}, {'numerical' if row['numerical'] else 'symbolic'}]"
+                     for _, row in self.history_items]
+            hint = f"{len(lines)} matching equations"
+        else:
+            self.history_items = [("session", row) for row in session_log().sessions()]
+            lines = [f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['started']))}  "
+                     f"{row['entries']:>4} equation{'s' if row['entries'] != 1 else ' '}  {row['first']} …"
+                     for _, row in self.history_items]
+            hint = "Recent sessions: Open replays the whole session"
+        self.history_list.insert(tk.END, *lines)
+        self.history_hint.configure(text=f"{hint} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    
+    def open_history_item(self, action="open"):
+        """Replay, plot or re-solve the selected session or entry."""
+        selection = self.history_list.curselection()
+        if not selection:
+            return
+        kind, row = self.history_items[selection[0]]
+        if kind == "session":
+            entries = session_log().entries(row["id"])
+            if action == "open":
+                self.replay_entries(entries, f"📂 Reopened the session of "
+                                    f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['started']))} "
+                                    f"({len(entries)} equations, from history — nothing was re-solved).")
+                return
+            row = entries[-1]  # plot / re-solve act on the session's last equation
+        if action == "plot":
+            self.plot_entry(row)
+        elif action == "resolve":
+            self.resolve_entry(row)
+        else:
+            self.replay_entries([row], "📂 From history:")
+    
+    def replay_entries(self, entries, note):
+        """Show logged entries in the chat from their stored display, without solving."""
+        self.add_bot_message(note)
+        with tracer.span("history.replay", entries=len(entries)):
+            for row in entries:
+                self.transcript.append({"kind": "text", "sender": "You", "text": row["input"], "is_bot": False})
+                if row["numerical"]:
+                    self.transcript.append({"kind": "text", "sender": "botX", "is_bot": True,
+                                            "text": f"{row['explanation']}\n{row['display']}"})
+                else:
+                    self.transcript.append({"kind": "solution", "latex": row["display"],
+                                            "explanation": row["explanation"]})
+                self.transcript.append({"kind": "history", "entry": row["id"], "input": row["input"],
+                                        "domain": row["domain"], "numerical": bool(row["numerical"])})
+        self.message_count += 2 * len(entries)
+        self.update_status()
+        self.transcript.scroll_to_end()
+    
+    def build_history_footer(self, parent, message):
+        """Plot / re-solve buttons under a replayed history entry."""
+        frame = ttk.Frame(parent, padding=(0, 5))
+        ttk.Label(frame, text="🕘 from history", background='#34495e',
+                  foreground='white').pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Button(frame, text="Plot", command=lambda: self.plot_entry(message)).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(frame, text="Re-solve", command=lambda: self.resolve_entry(message)).pack(side=tk.LEFT)
+        return frame
+    
+    def plot_entry(self, row):
+        """Plot a logged equation, rebuilt from its stored srepr."""
+        entry = session_log().entry(row["entry"] if "entry" in row else row["id"])
+        if entry is None:
+            return
+        try:
+            _, equation = SessionLog.load(entry)
         except Exception as e:
-            self.add_bot_message(f"❌ Error solving equation: {str(e)}\nPlease check your input and try again.")
+            self.add_bot_message(f"❌ Could not load that equation from history: {e}")
+            return
+        self.plot_equation(equation, entry["domain"])
+    
+    def resolve_entry(self, row):
+        """Solve a logged equation again with its original domain and mode.
+
+        Goes through the solution cache like any input; the cache is wiped
+        whenever the solver changes, so the answer is always a current one.
+        """
+        self.domain_var.set(row["domain"])
+        self.numerical_var.set(bool(row["numerical"]))
+        self.update_status()
+        self.input_entry.delete(0, tk.END)
+        self.input_entry.insert(0, row["input"])
+        self.send_message()
 
 # --- Run the application ---
-if __name__ == "__main__":
+CSV_FIELDS = ["line", "input", "symbols", "solutions", "domain", "numerical", "method", "cached", "elapsed", "error"]
+
+def run_solve_command(args):
+    """Stream solve_many() results for a file (or stdin) to stdout."""
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    # Profiling only sees this process, so solve in-process
+    jobs, timeout = (1, None) if args.profile else (args.jobs, args.timeout)
+    
+    def write_records():
+        interval = tuple(args.box or args.interval or ()) or None
+        records = solve_many(source, args.domain, args.numerical, jobs, timeout, interval, args.digits)
+        if args.format == "csv":
+            writer = csv.DictWriter(sys.stdout, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        for record in records:
+            if args.format == "csv":
+                row = dict(record)
+                if isinstance(row["solutions"], list):
+                    row["solutions"] = "; ".join(row["solutions"])
+                if row["symbols"] is not None:
+                    row["symbols"] = " ".join(row["symbols"])
+                writer.writerow(row)
+            else:
+                sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+    
+    try:
+        if args.trace:
+            tracer.enabled = True
+        if args.profile:
+            _, _, report = traced_call(args.profile, write_records)
+            sys.stderr.write(report)
+        else:
+            write_records()
+        if args.trace:
+            tracer.export_chrome(args.trace)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return 0
+
+def run_history_command(args):
+    """Print logged entries matching args.query (or the most recent ones) as JSONL."""
+    for row in session_log().search(args.query or "", args.limit):
+        row["created"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["created"]))
+        row["numerical"] = bool(row["numerical"])
+        sys.stdout.write(json.dumps(row) + "\n")
+    return 0
+
+def run_serve_command(args):
+    """Run SolveService until interrupted."""
+    service = SolveService(args.workers, args.timeout, args.max_queue)
+    def ready(host, port):
+        print(f"botX solve service on http://{host}:{port} "
+              f"({service.engine.max_workers} workers)", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def _print_startup_profile(phases):
+    """Print startup phase timings and the time spent in each heavy import."""
+    print("botX startup profile", file=sys.stderr)
+    previous = 0.0
+    for name, at in phases:
+        print(f"  {name:<24} {at * 1000:8.1f} ms  (+{(at - previous) * 1000:.1f} ms)", file=sys.stderr)
+        previous = at
+    print("  imports:", file=sys.stderr)
+    for name, seconds in sorted(_IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        print(f"    {name:<40} {seconds * 1000:8.1f} ms", file=sys.stderr)
+
+def run_gui(profile_startup=False):
+    phases = [("module loaded", time.perf_counter() - _START_TIME)]
     root = tk.Tk()
+    phases.append(("Tk root created", time.perf_counter() - _START_TIME))
     app = ModernBotXGUI(root)
-    root.mainloop()
+    phases.append(("widgets built", time.perf_counter() - _START_TIME))
+    # Paint the window before loading SymPy and starting the worker pool
+    root.update()
+    phases.append(("window visible", time.perf_counter() - _START_TIME))
+    app.start_services()
+    
+    if profile_startup:
+        def report():
+            if app.warmup_thread.is_alive():
+                root.after(10, report)
+                return
+            phases.append(("solver warm", time.perf_counter() - _START_TIME))
+            _print_startup_profile(phases)
+            root.quit()
+        root.after(10, report)
+    try:
+        root.mainloop()
+    finally:
+        app.solver_engine.shutdown()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="botx", description="botX AI Math Assistant")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print an import-time breakdown of GUI startup and exit")
+    commands = parser.add_subparsers(dest="command")
+    solve = commands.add_parser("solve", help="solve equations from a file without the GUI")
+    solve.add_argument("file", nargs="?", default="-",
+                       help="file with one equation per line (default: stdin)")
+    solve.add_argument("--domain", default="real", choices=["real", "complex", "imaginary"])
+    solve.add_argument("--numerical", action="store_true", help="force numerical solving")
+    solve.add_argument("--interval", nargs=2, type=float, metavar=("LO", "HI"),
+                       help=f"search interval for numerical real roots (default: {ROOT_INTERVAL[0]:g} {ROOT_INTERVAL[1]:g})")
+    solve.add_argument("--box", nargs=4, type=float, metavar=("RE_LO", "RE_HI", "IM_LO", "IM_HI"),
+                       help="search box for numerical complex roots (default: %g %g %g %g)" % ROOT_BOX)
+    solve.add_argument("--digits", type=int, default=None,
+                       help="significant digits numerical roots are certified to (with --numerical)")
+    solve.add_argument("--symbolic-budget", metavar="DOMAIN=SECONDS[:MB],...",
+                       help="time and memory allowed for exact solving before answering numerically "
+                            "(0 turns a limit off)")
+    solve.add_argument("--format", default="jsonl", choices=["jsonl", "csv"])
+    solve.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    solve.add_argument("--timeout", type=float, default=None,
+                       help="seconds allowed per equation")
+    solve.add_argument("--trace", metavar="FILE",
+                       help="write per-stage timings as a Chrome trace (chrome://tracing, Perfetto)")
+    solve.add_argument("--profile", metavar="FILE",
+                       help="run under cProfile in this process, save the stats to FILE "
+                            "and print the top functions to stderr")
+    serve = commands.add_parser("serve", help="run a local HTTP/JSON solve service")
+    serve.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=SERVE_PORT)
+    serve.add_argument("--workers", type=int, default=None,
+                       help="worker processes (default: one per CPU)")
+    serve.add_argument("--timeout", type=float, default=SOLVE_TIMEOUT,
+                       help="maximum seconds per solve")
+    serve.add_argument("--max-queue", type=int, default=SERVE_MAX_QUEUE,
+                       help="unique solves pending before requests get 503")
+    serve.add_argument("--symbolic-budget", metavar="DOMAIN=SECONDS[:MB],...",
+                       help="time and memory allowed for exact solving before answering numerically")
+    history = commands.add_parser("history", help="search the equations solved in the GUI")
+    history.add_argument("query", nargs="?", help="text the input must contain (default: list the most recent)")
+    history.add_argument("--limit", type=int, default=50, help="maximum entries to print (default: 50)")
+    args = parser.parse_args(argv)
+    if args.command == "solve" and args.interval and not args.interval[0] < args.interval[1]:
+        parser.error("--interval needs LO < HI")
+    if args.command == "solve" and args.box:
+        if args.interval:
+            parser.error("--box and --interval cannot be combined")
+        if not (args.box[0] < args.box[1] and args.box[2] < args.box[3]):
+            parser.error("--box needs RE_LO < RE_HI and IM_LO < IM_HI")
+    if args.command == "solve" and args.digits is not None and not 1 <= args.digits <= PRECISION_MAX_DPS:
+        parser.error(f"--digits must be between 1 and {PRECISION_MAX_DPS}")
+    if getattr(args, "symbolic_budget", None):
+        try:
+            set_symbolic_budgets(args.symbolic_budget)
+        except ValueError as e:
+            parser.error(f"--symbolic-budget: {e}")
+    
+    if args.command == "solve":
+        return run_solve_command(args)
+    if args.command == "serve":
+        return run_serve_command(args)
+    if args.command == "history":
+        return run_history_command(args)
+    return run_gui(args.profile_startup)
+
+if __name__ == "__main__":
+    sys.exit(main())
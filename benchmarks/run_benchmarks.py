@@ -0,0 +1,219 @@
+"""Benchmark suite for botX's solver, LaTeX rendering, plot sampling and evaluation.
+
+Times every equation in corpus.json and reports p50/p95/max latency and peak
+traced memory per category and benchmark:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+
+With --compare, a benchmark whose p50 or p95 grew by more than --threshold
+(and by more than --min-delta milliseconds) against the baseline is reported
+as a regression and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import BotX
+from BotX import sp, np
+
+BENCHMARKS = ("solve_symbolic", "solve_numerical", "solve_digits", "render_latex", "plot_sample", "evaluate_1m")
+EVALUATE_POINTS = 1_000_000
+DIGITS = 30  # significant digits asked for by solve_digits
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else None
+
+def _solve(equation, domain, numerical):
+    def run():
+        BotX.get_solution(equation, domain, numerical, cache=False)
+    return run
+
+def _solve_digits(equation, domain):
+    """Solve and format at DIGITS digits like `solve --numerical --digits`; errors stop the run."""
+    def run():
+        details = BotX.solve_details(equation, domain, True, cache=False, digits=DIGITS)
+        BotX._format_solutions(details["solutions"], DIGITS)
+    return run
+
+def _render(latex_str):
+    renderer = BotX.LatexRenderer(max_memory=0)  # no cache: every call draws
+    def run():
+        renderer.render(latex_str)
+    return run
+
+def _plot(equation):
+    eq = BotX.parse_equation(equation)
+    x = BotX.equation_symbols(eq)[0]
+    expr = eq.lhs - eq.rhs
+    def run():
+        BotX.adaptive_sample(BotX.plot_function(expr, x), *BotX.PLOT_RANGE)
+    return run
+
+def _evaluate(equation):
+    eq = BotX.parse_equation(equation)
+    x = BotX.equation_symbols(eq)[0]
+    f = BotX.compile_expression(eq.lhs - eq.rhs, x)  # compiled once: measures throughput only
+    xs = np.linspace(*BotX.PLOT_RANGE, EVALUATE_POINTS)
+    def run():
+        f(xs)
+    return run
+
+def build_cases(corpus, benchmarks, categories=None):
+    """Yield (category, benchmark, equation, callable) for every case to time."""
+    for category, spec in corpus.items():
+        if categories and category not in categories:
+            continue
+        domain = spec.get("domain", "real")
+        for raw in spec["equations"]:
+            equation = BotX.normalize_input(raw)
+            if "solve_symbolic" in benchmarks:
+                yield category, "solve_symbolic", raw, _solve(equation, domain, False)
+            if "solve_numerical" in benchmarks:
+                yield category, "solve_numerical", raw, _solve(equation, domain, True)
+            if "solve_digits" in benchmarks:
+                yield category, "solve_digits", raw, _solve_digits(equation, domain)
+            if "render_latex" in benchmarks:
+                solutions, _ = BotX.get_solution(equation, domain, False, cache=False)
+                yield category, "render_latex", raw, _render(sp.latex(solutions))
+            eq = BotX.parse_system(equation)
+            if domain == "real" and len(eq) == 1 and BotX.is_plottable(eq[0]):
+                if "plot_sample" in benchmarks:
+                    yield category, "plot_sample", raw, _plot(equation)
+                if "evaluate_1m" in benchmarks:
+                    yield category, "evaluate_1m", raw, _evaluate(equation)
+
+def time_case(run, repeat):
+    """Latencies in milliseconds; SymPy's and botX's compile caches are cleared before every call."""
+    samples = []
+    for _ in range(repeat):
+        sp.core.cache.clear_cache()
+        BotX.clear_compiled_cache()
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def peak_memory(run):
+    """Peak traced allocation of one call, in KiB."""
+    sp.core.cache.clear_cache()
+    BotX.clear_compiled_cache()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def run_suite(corpus, benchmarks=BENCHMARKS, categories=None, repeat=5, memory=True, log=None):
+    """Run the benchmarks and return the results as a JSON-friendly dict."""
+    BotX.warm_solver()
+    groups = {}
+    for category, bench, equation, run in build_cases(corpus, benchmarks, categories):
+        run()  # warm-up: imports and one-off compilation are not measured
+        group = groups.setdefault((category, bench), {"samples": [], "peak_kib": 0.0, "cases": 0})
+        group["samples"].extend(time_case(run, repeat))
+        if memory:
+            group["peak_kib"] = max(group["peak_kib"], peak_memory(run))
+        group["cases"] += 1
+        if log:
+            log(f"{category:<16} {bench:<16} {equation}")
+
+    results = {}
+    for (category, bench), group in sorted(groups.items()):
+        samples = group["samples"]
+        results.setdefault(category, {})[bench] = {
+            "cases": group["cases"],
+            "samples": len(samples),
+            "p50_ms": round(_percentile(samples, 50), 3),
+            "p95_ms": round(_percentile(samples, 95), 3),
+            "max_ms": round(max(samples), 3),
+            "peak_kib": round(group["peak_kib"], 1) if memory else None,
+        }
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sympy": sp.__version__,
+            "numpy": np.__version__,
+            "cache_version": BotX.CACHE_VERSION,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=1.25, min_delta=1.0):
+    """Return a list of regression messages of current against baseline."""
+    regressions = []
+    for category, benches in current["results"].items():
+        for bench, stats in benches.items():
+            old = baseline.get("results", {}).get(category, {}).get(bench)
+            if old is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                new_value, old_value = stats[metric], old[metric]
+                if new_value > old_value * threshold and new_value - old_value > min_delta:
+                    regressions.append(f"{category}/{bench} {metric}: {old_value:.3f} -> {new_value:.3f} ms "
+                                       f"({new_value / old_value:.2f}x)")
+            if stats.get("peak_kib") and old.get("peak_kib") and stats["peak_kib"] > old["peak_kib"] * threshold:
+                regressions.append(f"{category}/{bench} peak_kib: {old['peak_kib']:.1f} -> {stats['peak_kib']:.1f}")
+    return regressions
+
+def format_table(report):
+    lines = [f"{'category':<16} {'benchmark':<16} {'cases':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'peak KiB':>9}"]
+    for category, benches in report["results"].items():
+        for bench, s in benches.items():
+            peak = f"{s['peak_kib']:9.1f}" if s["peak_kib"] is not None else f"{'-':>9}"
+            lines.append(f"{category:<16} {bench:<16} {s['cases']:>5} {s['p50_ms']:>9.3f} "
+                         f"{s['p95_ms']:>9.3f} {s['max_ms']:>9.3f} {peak}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark botX's solver, rendering and plotting.")
+    parser.add_argument("--corpus", default=os.path.join(HERE, "corpus.json"), help="equation corpus (JSON)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored results file")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio counted as a regression (default: 1.25)")
+    parser.add_argument("--min-delta", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this many ms (default: 1.0)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default: 5)")
+    parser.add_argument("--category", action="append", help="only run this category (repeatable)")
+    parser.add_argument("--bench", action="append", choices=BENCHMARKS, help="only run this benchmark (repeatable)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each case as it runs")
+    args = parser.parse_args(argv)
+
+    log = (lambda msg: print(msg, file=sys.stderr)) if args.verbose else None
+    report = run_suite(load_corpus(args.corpus), tuple(args.bench or BENCHMARKS), args.category,
+                       args.repeat, not args.no_memory, log)
+    print(format_table(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.compare}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())